@@ -0,0 +1,19 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'queue',
+        'status',
+        'attempts',
+        'run_at',
+        'duration',
+    )
+    list_filter = ('status', 'queue', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('locked_by', 'locked_at', 'finished', 'last_error')
@@ -0,0 +1,176 @@
+"""ASGI-вход для Django 2.2, в которой своего ASGI ещё нет.
+
+Представления и ORM остаются синхронными: ``ASGIHandler`` читает тело
+запроса в цикле событий, а сам запрос отдаёт ``WSGIHandler`` в потоке
+из ограниченного пула. Поэтому медленный запрос к базе или миниатюра
+занимают один поток, а не весь процесс: остальные ленты и посты
+отдаются параллельно. Чтение (GET, HEAD, OPTIONS) и запись выполняются
+в разных пулах (``ASGI_READ_THREADS`` и ``ASGI_WRITE_THREADS``), чтобы
+загрузки картинок не занимали потоки лент. У каждого потока своё
+соединение с базой, поэтому пул соединений должен вмещать оба пула.
+
+Запрос от начала до ``close()`` ответа проходит в одном потоке: Django
+закрывает соединения с базой по сигналу ``request_finished`` в том же
+потоке, где их открыл. Части ответа отправляются в цикл событий по
+одной, и поток ждёт отправки, так что медленный клиент не копит ответ
+в памяти.
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Тело запроса больше этого размера (загрузка картинки) уходит на диск.
+MAX_MEMORY_BODY = 2 ** 20
+
+
+def _latin1(value):
+    return value.decode('latin-1') if isinstance(value, bytes) else value
+
+
+def environ(scope, body):
+    """WSGI-окружение для HTTP-запроса ASGI (PEP 3333)."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    result = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI передаёт байты пути как строку latin-1.
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': _latin1(scope.get('query_string', b'')),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = _latin1(name).upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        value = _latin1(value)
+        if name in result:
+            # HTTP/2 присылает каждую cookie отдельным заголовком, а
+            # Django разбирает их через "; ".
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = f'{result[name]}{separator}{value}'
+        result[name] = value
+    return result
+
+
+class ASGIHandler:
+    """ASGI-приложение (спецификация 3.0) поверх ``WSGIHandler``."""
+
+    def __init__(self, wsgi_application=None, read_threads=None,
+                 write_threads=None):
+        self.wsgi_application = wsgi_application or WSGIHandler()
+        self.executors = {
+            'read': ThreadPoolExecutor(
+                read_threads or settings.ASGI_READ_THREADS,
+                thread_name_prefix='asgi-read',
+            ),
+            'write': ThreadPoolExecutor(
+                write_threads or settings.ASGI_WRITE_THREADS,
+                thread_name_prefix='asgi-write',
+            ),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f"Тип соединения {scope['type']} не поддержан")
+        body = await self.read_body(receive)
+        if body is None:
+            return None
+        pool = 'read' if scope['method'] in SAFE_METHODS else 'write'
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self.executors[pool],
+                self.run,
+                environ(scope, body),
+                send,
+                loop,
+            )
+        finally:
+            body.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        """Тело запроса файлом или None, если клиент отключился."""
+        body = tempfile.SpooledTemporaryFile(max_size=MAX_MEMORY_BODY)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body
+
+    def run(self, environ, send, loop):
+        """Выполняет запрос в потоке пула и отправляет ответ клиенту."""
+        def send_sync(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+
+        response = self.wsgi_application(environ, start_response)
+        try:
+            status, headers = started
+            send_sync({
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [
+                    (name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in headers
+                ],
+            })
+            # Тело ответа на HEAD ASGI-сервер не отбрасывает сам.
+            head = environ['REQUEST_METHOD'] == 'HEAD'
+            for chunk in response:
+                if chunk and not head:
+                    send_sync({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            send_sync({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
+
+
+def get_asgi_application():
+    """Аналог ``get_wsgi_application`` для ASGI-сервера."""
+    import django
+    django.setup(set_prefix=False)
+    return ASGIHandler()
@@ -0,0 +1,438 @@
+"""Нагрузочные замеры страниц Yatube.
+
+``seed`` заполняет базу правдоподобными данными: подписки распределены
+по закону Ципфа, поэтому у немногих авторов много подписчиков и постов.
+``measure`` прогоняет каждый адрес из ``posts.urls`` и ``about.urls``
+через тестовый клиент и собирает перцентили времени ответа, число
+SQL-запросов и пик памяти. ``profile_templates`` раскладывает время
+отрисовки тех же страниц по шаблонам и include. ``throughput``
+сравнивает пропускную способность WSGI и ASGI (``core.asgi``) под
+одновременной нагрузкой.
+"""
+import asyncio
+import io
+import itertools
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import mixer
+
+PERCENTILES = (50, 90, 95, 99)
+BATCH_SIZE = 5000
+TEXT_POOL_SIZE = 1000
+BENCH_NAMESPACES = ('posts', 'about')
+# Адреса, которые меняют данные: замер посреди прогона сдвинул бы их.
+BENCH_EXCLUDED_URLS = (
+    'posts:add_comment',
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+)
+# Ленты и страница поста: для них и нужен ASGI.
+THROUGHPUT_URLS = (
+    'posts:index',
+    'posts:popular',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+)
+
+
+def zipf_weights(count, exponent=1.1):
+    """Веса с тяжёлым хвостом: k-й элемент популярнее в k**s раз."""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def _batched(objects, model):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def seed(users, groups, posts, comments, follows, days=365, log=print):
+    """Заполняет базу пачками в обход сигналов.
+
+    Счётчики, ленты и поисковый индекс пересчитываются в конце.
+    """
+    from posts import counters, search, timeline, trending
+    from posts.models import Comment, Follow, Group, Post, User
+    from posts.utils import manual_pub_date
+
+    faker = Faker('ru_RU')
+    random_ = random.Random(0)
+    texts = [faker.text(max_nb_chars=500) for _ in range(TEXT_POOL_SIZE)]
+    now = timezone.now()
+
+    def random_date():
+        return now - timedelta(seconds=random_.randrange(days * 86400))
+
+    offset = (User.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first() or 0) + 1
+    log(f'Пользователи: {users}')
+    mixer.cycle(users).blend(
+        User,
+        username=mixer.sequence(lambda n: f'bench{offset + n}'),
+        first_name=mixer.faker.first_name,
+        last_name=mixer.faker.last_name,
+    )
+    user_ids = list(
+        User.objects.filter(pk__gte=offset).values_list('pk', flat=True)
+    )
+    log(f'Группы: {groups}')
+    mixer.cycle(groups).blend(
+        Group, slug=mixer.sequence(lambda n: f'bench-{offset}-{n}')
+    )
+    group_ids = list(Group.objects.values_list('pk', flat=True))
+
+    weights = list(itertools.accumulate(zipf_weights(len(user_ids))))
+
+    def popular_user():
+        return random_.choices(user_ids, cum_weights=weights)[0]
+
+    with transaction.atomic(), manual_pub_date(Post, Comment):
+        log(f'Посты: {posts}')
+        _batched(
+            (
+                Post(
+                    text=random_.choice(texts),
+                    author_id=popular_user(),
+                    group_id=random_.choice(group_ids + [None]),
+                    pub_date=random_date(),
+                )
+                for _ in range(posts)
+            ),
+            Post,
+        )
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        log(f'Комментарии: {comments}')
+        _batched(
+            (
+                Comment(
+                    post_id=random_.choice(post_ids),
+                    author_id=random_.choice(user_ids),
+                    text=random_.choice(texts)[:200],
+                    created=random_date(),
+                )
+                for _ in range(comments)
+            ),
+            Comment,
+        )
+        log(f'Подписки: {follows}')
+        _batched(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in (
+                    (random_.choice(user_ids), popular_user())
+                    for _ in range(follows)
+                )
+                if user_id != author_id
+            ),
+            Follow,
+        )
+    log('Счётчики, ленты и поисковый индекс')
+    counters.reconcile_users()
+    counters.reconcile_groups()
+    counters.reconcile_posts()
+    if timeline.is_enabled():
+        timeline.rebuild()
+    search.rebuild()
+    trending.recompute()
+
+
+def _urls(namespace):
+    resolver = get_resolver()
+    for pattern in resolver.url_patterns:
+        if (
+            isinstance(pattern, URLResolver)
+            and pattern.namespace == namespace
+        ):
+            for entry in pattern.url_patterns:
+                yield f'{namespace}:{entry.name}', list(
+                    entry.pattern.converters
+                )
+
+
+def bench_urls():
+    """Адреса всех страниц для чтения с параметрами из заполненной базы."""
+    from posts.models import Follow, Group, Post
+
+    post = Post.objects.order_by('-pk').first()
+    follow = Follow.objects.select_related('author').first()
+    values = {
+        'slug': Group.objects.order_by('-posts_count').first().slug,
+        'username': follow.author.username,
+        'post_id': post.pk,
+    }
+    for namespace in BENCH_NAMESPACES:
+        for name, params in _urls(namespace):
+            if name in BENCH_EXCLUDED_URLS:
+                continue
+            yield name, reverse(
+                name, kwargs={param: values[param] for param in params}
+            )
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = round(percent / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+def measure(requests=50, cold=False, log=print):
+    """Замеры для каждого адреса: время (мс), запросы, память (КиБ)."""
+    from posts.models import Post
+
+    client = Client()
+    client.force_login(Post.objects.order_by('-pk').first().author)
+    results = {}
+    for name, url in bench_urls():
+        timings, queries = [], []
+        for _ in range(requests):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        # tracemalloc замедляет выделение памяти, поэтому память
+        # замеряется отдельным запросом.
+        if cold:
+            cache.clear()
+        tracemalloc.start()
+        client.get(url)
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+        results[name] = {
+            'url': url,
+            'status': response.status_code,
+            'mean_ms': round(statistics.mean(timings), 3),
+            **{
+                f'p{percent}_ms': round(_percentile(timings, percent), 3)
+                for percent in PERCENTILES
+            },
+            'queries': max(queries),
+            'peak_memory_kib': round(peak, 1),
+        }
+        log(f'{name}: {results[name]}')
+    return results
+
+
+def profile_templates(requests=20, keep_cache=False):
+    """Время по шаблонам: {имя: {count, total_ms, self_ms}} за все страницы.
+
+    ``self_ms`` — время без вложенных шаблонов, ``total_ms`` — с ними.
+    Без ``keep_cache`` кэш очищается перед каждым запросом, иначе
+    страницы и карточки постов отдаются из кэша и шаблоны не рисуются.
+    """
+    from core.instrumentation import (disable_template_profiling,
+                                      enable_template_profiling)
+    from posts.models import Post
+
+    enabled = enable_template_profiling()
+    client = Client()
+    client.force_login(Post.objects.order_by('-pk').first().author)
+    totals = {}
+    try:
+        for _, url in bench_urls():
+            for _ in range(requests):
+                if not keep_cache:
+                    cache.clear()
+                metrics = client.get(url).wsgi_request.metrics
+                for name, stats in metrics.templates.items():
+                    total = totals.setdefault(name, [0, 0.0, 0.0])
+                    for index, value in enumerate(stats):
+                        total[index] += value
+    finally:
+        if enabled:
+            disable_template_profiling()
+    return {
+        name: {
+            'count': count,
+            'total_ms': round(total * 1000, 3),
+            'self_ms': round(own * 1000, 3),
+        }
+        for name, (count, total, own) in sorted(
+            totals.items(), key=lambda item: item[1][2], reverse=True
+        )
+    }
+
+
+def _with_latency(application, latency):
+    """WSGI-приложение, где каждый SQL-запрос ждёт ``latency`` секунд.
+
+    Так SQLite ведёт себя как база по сети: поток простаивает в ожидании
+    ответа, и видно, сколько таких ожиданий успевает перекрыться.
+    """
+    def delay(execute, sql, params, many, context):
+        time.sleep(latency)
+        return execute(sql, params, many, context)
+
+    def wrapped(environ, start_response):
+        # Соединения у каждого потока свои, обёртка ставится в потоке
+        # запроса.
+        with connection.execute_wrapper(delay):
+            return application(environ, start_response)
+
+    return wrapped if latency else application
+
+
+def _scope(url):
+    path, _, query = url.partition('?')
+    return {
+        'type': 'http',
+        'method': 'GET',
+        'path': path,
+        'query_string': query.encode(),
+        'headers': [],
+        'server': ('testserver', 80),
+    }
+
+
+def _wsgi_status(application, environ):
+    statuses = []
+    response = application(
+        environ, lambda status, headers, exc_info=None: statuses.append(
+            status
+        )
+    )
+    try:
+        b''.join(response)
+    finally:
+        response.close()
+    return int(statuses[0].split(' ', 1)[0])
+
+
+async def _asgi_status(application, scope):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    return messages[0]['status']
+
+
+async def _load(call, urls, requests, concurrency):
+    """``concurrency`` клиентов по очереди запрашивают ``urls``."""
+    numbers = iter(range(requests))
+    timings, errors = [], 0
+
+    async def client():
+        nonlocal errors
+        for number in numbers:
+            # Уникальный параметр обходит кэш страниц: замеряется работа
+            # представления, а не чтение из кэша.
+            url = f'{urls[number % len(urls)]}?bench={number}'
+            started = time.perf_counter()
+            if await call(url) >= 500:
+                errors += 1
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'errors': errors,
+        'requests_per_s': round(requests / elapsed, 1),
+        **{
+            f'p{percent}_ms': round(_percentile(timings, percent), 3)
+            for percent in PERCENTILES
+        },
+    }
+
+
+def throughput(requests=200, concurrency=16, latency=0.0, log=print):
+    """Запросов в секунду и задержки для WSGI и ASGI в одном процессе.
+
+    WSGI обслуживает запросы по одному, как синхронный воркер gunicorn;
+    ASGI — в пулах потоков ``ASGI_READ_THREADS``. ``latency`` добавляет
+    к каждому SQL-запросу задержку сети до базы (секунды).
+    """
+    from core.asgi import ASGIHandler, environ
+
+    urls = [url for name, url in bench_urls() if name in THROUGHPUT_URLS]
+    wsgi = _with_latency(WSGIHandler(), latency)
+    worker = ThreadPoolExecutor(1, thread_name_prefix='wsgi')
+    asgi = ASGIHandler(wsgi_application=wsgi)
+
+    async def wsgi_call(url):
+        return await asyncio.get_running_loop().run_in_executor(
+            worker, _wsgi_status, wsgi, environ(_scope(url), io.BytesIO())
+        )
+
+    async def asgi_call(url):
+        return await _asgi_status(asgi, _scope(url))
+
+    results = {}
+    try:
+        for name, call in (('wsgi', wsgi_call), ('asgi', asgi_call)):
+            results[name] = asyncio.run(
+                _load(call, urls, requests, concurrency)
+            )
+            log(f'{name}: {results[name]}')
+    finally:
+        worker.shutdown()
+        asgi.shutdown()
+    return results
+
+
+def regressions(results, baseline=None, thresholds=None, tolerance=0.2):
+    """Список нарушений порогов и ухудшений относительно прошлого прогона.
+
+    ``thresholds`` — ``{имя адреса или "*": {метрика: максимум}}``.
+    """
+    problems = []
+    thresholds = thresholds or {}
+    for name, metrics in results.items():
+        limits = {**thresholds.get('*', {}), **thresholds.get(name, {})}
+        for metric, limit in limits.items():
+            if metrics[metric] > limit:
+                problems.append(
+                    f'{name}: {metric}={metrics[metric]} > {limit}'
+                )
+        previous = (baseline or {}).get(name)
+        if previous is None:
+            continue
+        if metrics['queries'] > previous['queries']:
+            problems.append(
+                f"{name}: queries {previous['queries']} -> "
+                f"{metrics['queries']}"
+            )
+        if metrics['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            problems.append(
+                f"{name}: p95_ms {previous['p95_ms']} -> {metrics['p95_ms']}"
+            )
+    return problems
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def dump(results, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,146 @@
+"""Кэш страниц с инвалидацией по поколениям.
+
+Каждая страница зависит от набора областей (``index``, ``group:<id>``,
+``post:<id>`` и т. п.). У области есть номер поколения в кэше, и он входит
+в ключ страницы. Изменение данных увеличивает поколение, поэтому старые
+страницы больше не находятся и вытесняются по таймауту, а новые можно
+хранить сколь угодно долго.
+
+В ключ входят только параметры запроса, которые читают представления
+(``PAGE_PARAMS``): посторонние ``?utm_source=`` и т. п. не плодят копий.
+
+Тот же ключ служит ``ETag`` страницы: проверка ``If-None-Match``
+стоит одного чтения поколений и не трогает ни базу, ни шаблоны.
+``Last-Modified`` не отдаётся: правки, удаления, подписки и вход
+меняют страницу, но не время её последней записи.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import urlencode
+
+from . import db_router, instrumentation
+
+GENERATION_KEY = 'generation:{}'
+PAGE_KEY = 'page:{prefix}:{digest}'
+# Параметры страниц: номер, курсоры ленты и комментариев, поиск, формат.
+PAGE_PARAMS = ('page', 'after', 'before', 'q', 'format')
+
+
+def _new_generation():
+    # Поколение после вытеснения ключа не должно совпасть с прежним.
+    return int(time.time() * 1000)
+
+
+def get_generations(scopes):
+    """Текущие поколения областей одним запросом к кэшу."""
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: _new_generation() for key in keys if key not in found}
+    for key, generation in missing.items():
+        if not cache.add(key, generation, None):
+            missing[key] = cache.get(key, generation)
+    found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Делает устаревшими все страницы, зависящие от областей."""
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_generation(), None)
+
+
+def skip_page_cache(request):
+    """Не кэшировать текущую страницу: в ней временные данные."""
+    request.skip_page_cache = True
+
+
+def _auth_state(request):
+    if not request.user.is_authenticated:
+        return 'anon'
+    # Страница с формой содержит CSRF-токен, он валиден только для
+    # той же cookie, поэтому она входит в ключ.
+    get_token(request)
+    return '{}:{}'.format(request.user.pk, request.META.get('CSRF_COOKIE'))
+
+
+def _page_location(request, params):
+    query = [
+        (name, value)
+        for name in params for value in request.GET.getlist(name)
+    ]
+    return f'{request.path}?{urlencode(query)}'
+
+
+def page_digest(request, scopes, params=PAGE_PARAMS):
+    parts = [
+        _page_location(request, params),
+        _auth_state(request),
+        *map(str, get_generations(scopes)),
+    ]
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def _add_validators(request, response, etag):
+    response['ETag'] = etag
+    # Без no-cache браузер сам решил бы, сколько не спрашивать сервер.
+    patch_cache_control(
+        response, no_cache=True, private=request.user.is_authenticated
+    )
+
+
+def cache_page_generations(scopes, key_prefix, timeout=None,
+                           params=PAGE_PARAMS):
+    """Аналог ``cache_page``, сбрасываемый через ``bump``.
+
+    ``scopes(request, *args, **kwargs)`` возвращает области страницы,
+    ``params`` — параметры запроса, от которых она зависит. Клиент с
+    актуальным ``ETag`` получает 304.
+    """
+    if timeout is None:
+        timeout = settings.PAGE_CACHE_TIMEOUT
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            digest = page_digest(
+                request, scopes(request, *args, **kwargs), params
+            )
+            etag = f'"{digest}"'
+            if 'HTTP_IF_NONE_MATCH' in request.META:
+                not_modified = get_conditional_response(request, etag=etag)
+                if not_modified is not None:
+                    _add_validators(request, not_modified, etag)
+                    return not_modified
+            key = PAGE_KEY.format(prefix=key_prefix, digest=digest)
+            response = cache.get(key)
+            instrumentation.record_cache(key_prefix, response is not None)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if (
+                    response.status_code != 200
+                    or response.streaming
+                    or getattr(request, 'skip_page_cache', False)
+                ):
+                    return response
+                _add_validators(request, response, etag)
+                cache.set(key, response, (
+                    settings.REPLICA_PAGE_CACHE_TIMEOUT
+                    if db_router.replica_used() else timeout
+                ))
+            return get_conditional_response(
+                request, etag=etag, response=response
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,19 @@
+"""SQLite с пулом и настройкой через PRAGMA.
+
+``OPTIONS['pragmas']`` выполняются для каждого нового соединения,
+например ``journal_mode = WAL``: читатели не ждут писателя.
+"""
+from django.db.backends.sqlite3 import base
+
+from ...pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    own_options = ('pool', 'pragmas')
+
+    def create_connection(self, conn_params):
+        connection = super().create_connection(conn_params)
+        pragmas = self.settings_dict['OPTIONS'].get('pragmas', {})
+        for name, value in pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
@@ -0,0 +1,229 @@
+"""Пул соединений с базой данных.
+
+Django 2.2 не умеет держать пул: при ``CONN_MAX_AGE = 0`` соединение
+открывается и закрывается в каждом запросе, и для PostgreSQL установка
+соединения занимает больше, чем сам короткий запрос. Бэкенды из
+``core.db.backends`` с ``OPTIONS['pool']`` берут соединение из
+``ConnectionPool`` и возвращают его туда вместо закрытия.
+
+Пул свой у каждого процесса (gunicorn-воркера) и у каждого алиаса базы:
+``size`` соединений живут постоянно, ещё до ``max_overflow`` создаются
+при пиковой нагрузке и закрываются после возврата. Когда свободных нет,
+запрос ждёт до ``timeout`` секунд. Соединения старше ``recycle`` секунд
+пересоздаются, а простоявшие дольше ``check_interval`` перед выдачей
+проверяются ``SELECT 1``. Время ожидания попадает в метрики запроса
+(``Server-Timing: pool``), общие счётчики отдаёт ``stats()``.
+"""
+import os
+import threading
+import time
+from collections import Counter, deque
+
+from core import instrumentation
+from django.db import OperationalError
+
+DEFAULTS = {
+    'size': 5,
+    'max_overflow': 5,
+    'timeout': 10.0,
+    'recycle': 60 * 60,
+    'check_interval': 30.0,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+def _healthy(connection):
+    try:
+        cursor = connection.cursor()
+        cursor.execute('SELECT 1')
+        cursor.close()
+    except Exception:
+        return False
+    return True
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    def __init__(self, size=5, max_overflow=5, timeout=10.0,
+                 recycle=60 * 60, check_interval=30.0):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.check_interval = check_interval
+        self.pid = os.getpid()
+        # Свободные соединения: (соединение, создано, возвращено).
+        self._idle = deque()
+        self._created = {}
+        # Соединения, которые создаются прямо сейчас.
+        self._opening = 0
+        self._condition = threading.Condition()
+        self.counters = Counter()
+        self.max_wait = 0.0
+
+    def owns(self, connection):
+        return id(connection) in self._created
+
+    def _discard(self, connection):
+        with self._condition:
+            self._created.pop(id(connection), None)
+            self.counters['discarded'] += 1
+            self._condition.notify()
+        _close(connection)
+
+    def _take(self, deadline):
+        """Свободное соединение, None (можно создать) или PoolTimeout."""
+        with self._condition:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                opened = len(self._created) + self._opening
+                if opened < self.size + self.max_overflow:
+                    self._opening += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.counters['timeouts'] += 1
+                    raise PoolTimeout(
+                        f'Нет свободных соединений за {self.timeout} с'
+                    )
+                self.counters['waits'] += 1
+                self._condition.wait(remaining)
+
+    def acquire(self, connect):
+        """Соединение из пула; ``connect()`` создаёт новое."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            taken = self._take(deadline)
+            if taken is None:
+                break
+            connection, created, returned = taken
+            now = time.monotonic()
+            if now - created > self.recycle or (
+                now - returned > self.check_interval
+                and not _healthy(connection)
+            ):
+                self._discard(connection)
+                continue
+            self._record_wait(started)
+            return connection
+        try:
+            connection = connect()
+        except Exception:
+            with self._condition:
+                self._opening -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._opening -= 1
+            self._created[id(connection)] = time.monotonic()
+            self.counters['created'] += 1
+        self._record_wait(started)
+        return connection
+
+    def _record_wait(self, started):
+        waited = time.monotonic() - started
+        with self._condition:
+            self.counters['acquired'] += 1
+            self.counters['wait_time'] += waited
+            self.max_wait = max(self.max_wait, waited)
+        instrumentation.record_pool_wait(waited)
+
+    def release(self, connection):
+        """Возвращает соединение; лишнее или сломанное закрывается."""
+        try:
+            connection.rollback()
+        except Exception:
+            self._discard(connection)
+            return
+        with self._condition:
+            created = self._created.get(id(connection))
+            if (
+                created is not None
+                and len(self._idle) < self.size
+                and time.monotonic() - created <= self.recycle
+            ):
+                self._idle.append((connection, created, time.monotonic()))
+                self._condition.notify()
+                return
+        self._discard(connection)
+
+    def close(self):
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'size': self.size,
+                'open': len(self._created),
+                'idle': len(self._idle),
+                **self.counters,
+                'max_wait': self.max_wait,
+            }
+
+
+def get_pool(alias, options):
+    """Пул алиаса в текущем процессе; после fork создаётся новый."""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None or pool.pid != os.getpid():
+            _pools[alias] = ConnectionPool(**{**DEFAULTS, **options})
+        return _pools[alias]
+
+
+def stats():
+    """Счётчики всех пулов процесса по алиасам."""
+    return {alias: pool.stats() for alias, pool in _pools.items()}
+
+
+class PooledDatabaseWrapperMixin:
+    """Берёт соединения из пула, если в ``OPTIONS`` есть ``pool``."""
+
+    # Ключи OPTIONS, которые не передаются драйверу базы.
+    own_options = ('pool',)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for key in self.own_options:
+            params.pop(key, None)
+        return params
+
+    def create_connection(self, conn_params):
+        return super().get_new_connection(conn_params)
+
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if options is None:
+            return self.create_connection(conn_params)
+        return get_pool(self.alias, options).acquire(
+            lambda: self.create_connection(conn_params)
+        )
+
+    def _close(self):
+        pool = _pools.get(self.alias)
+        # Внутри atomic Django продолжит ссылаться на соединение, поэтому
+        # отдавать его другому потоку нельзя.
+        if (
+            pool is None
+            or self.in_atomic_block
+            or not pool.owns(self.connection)
+        ):
+            return super()._close()
+        with self.wrap_database_errors:
+            return pool.release(self.connection)
@@ -0,0 +1,93 @@
+"""Чтение ленты с реплик базы данных.
+
+Запросы на чтение уходят на реплику (``DATABASE_REPLICAS``) только внутри
+представлений, помеченных ``use_replica``, — это страницы ленты. Всё
+остальное, включая любые записи, идёт в ``default``. После записи
+``ReplicaPinMiddleware`` ставит cookie, и ``REPLICA_PIN_SECONDS`` секунд
+чтение для этого клиента идёт с основной базы: автор сразу видит свой
+пост, даже если реплика отстаёт.
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+PRIMARY = 'default'
+PIN_COOKIE = 'db_pin'
+
+_state = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica_allowed = False
+        self.wrote = False
+        self.used_replica = False
+
+
+def start(pinned=False):
+    state = RoutingState(pinned)
+    return state, _state.set(state)
+
+
+def finish(token):
+    _state.reset(token)
+
+
+def current():
+    return _state.get()
+
+
+def replica_used():
+    """Читал ли текущий запрос с реплики."""
+    state = current()
+    return state is not None and state.used_replica
+
+
+def use_replica(view):
+    """Разрешает представлению читать с реплики."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = current()
+        if state is None:
+            return view(request, *args, **kwargs)
+        previous, state.replica_allowed = state.replica_allowed, True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.replica_allowed = previous
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current()
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or state is None
+            or not state.replica_allowed
+            or state.pinned
+            or state.wrote
+        ):
+            return PRIMARY
+        state.used_replica = True
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = current()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему от основной базы репликацией.
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,160 @@
+"""Метрики текущего запроса: SQL, шаблоны, кэш, ожидание пула соединений.
+
+Метрики лежат в ``ContextVar``, поэтому их можно собирать из любого
+места кода, не передавая запрос: обёртки SQL, бэкенда шаблонов и кэша
+страниц пишут в объект, созданный ``InstrumentationMiddleware``.
+
+Профилировщик шаблонов (``TEMPLATE_PROFILING`` или команда
+``profile_templates``) разносит время отрисовки по каждому шаблону,
+включая ``{% include %}`` и родителей ``{% extends %}``: полное время
+и собственное, без вложенных шаблонов.
+"""
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.template import base
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.django import Template as DjangoTemplate
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.sql = Counter()
+        self.template_time = 0.0
+        self.templates = {}
+        self._nested = []
+        self.cache = Counter()
+        self.pool_wait = 0.0
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def time_template(self, name, render, *args):
+        """Замеряет отрисовку шаблона: [число, полное время, собственное]."""
+        started = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            return render(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+            stats = self.templates.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] += elapsed - nested
+
+    def duplicates(self, threshold, ignore=()):
+        """SQL-шаблоны, выполненные не меньше ``threshold`` раз.
+
+        Запросы к таблицам из ``ignore`` не считаются.
+        """
+        return {
+            sql: count for sql, count in self.sql.items()
+            if count >= threshold
+            and not any(table in sql for table in ignore)
+        }
+
+
+def start():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def record_cache(name, hit):
+    metrics = current()
+    if metrics is not None:
+        metrics.cache[f"{name}_{'hit' if hit else 'miss'}"] += 1
+
+
+def record_pool_wait(seconds):
+    metrics = current()
+    if metrics is not None:
+        metrics.pool_wait += seconds
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Обёртка ``connection.execute_wrapper`` для подсчёта запросов."""
+    metrics = current()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+        metrics.sql[sql] += 1
+
+
+class Template(DjangoTemplate):
+    def render(self, context=None, request=None):
+        metrics = current()
+        if metrics is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, замеряющий время отрисовки страницы."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return Template(template.template, self)
+
+
+def template_name(template):
+    return template.origin.template_name or template.name or '<string>'
+
+
+def enable_template_profiling():
+    """Подменяет ``Template._render``, как это делает тестовый раннер.
+
+    Возвращает False, если профилирование уже включено.
+    """
+    original = base.Template._render
+    if getattr(original, 'profiled', False):
+        return False
+
+    def _render(self, context):
+        metrics = current()
+        if metrics is None:
+            return original(self, context)
+        return metrics.time_template(
+            template_name(self), original, self, context
+        )
+
+    _render.profiled = True
+    _render.original = original
+    base.Template._render = _render
+    return True
+
+
+def disable_template_profiling():
+    """Возвращает исходный ``Template._render``."""
+    render = base.Template._render
+    if getattr(render, 'profiled', False):
+        base.Template._render = render.original
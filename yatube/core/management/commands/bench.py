@@ -0,0 +1,45 @@
+from core import benchmark
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа, число запросов и память для всех страниц '
+        'posts и about и сравнивает с порогами и прошлым прогоном.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.',
+        )
+        parser.add_argument('--output', help='Куда сохранить JSON.')
+        parser.add_argument('--baseline', help='JSON прошлого прогона.')
+        parser.add_argument('--thresholds', help='JSON с порогами метрик.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост p95 относительно прошлого прогона.',
+        )
+
+    def handle(self, *args, **options):
+        results = benchmark.measure(
+            requests=options['requests'],
+            cold=options['cold'],
+            log=self.stdout.write,
+        )
+        if options['output']:
+            benchmark.dump(results, options['output'])
+        problems = benchmark.regressions(
+            results,
+            baseline=options['baseline'] and benchmark.load(
+                options['baseline']
+            ),
+            thresholds=options['thresholds'] and benchmark.load(
+                options['thresholds']
+            ),
+            tolerance=options['tolerance'],
+        )
+        if problems:
+            raise CommandError('\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
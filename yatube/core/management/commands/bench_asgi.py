@@ -0,0 +1,33 @@
+from core import benchmark
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность лент и страницы поста '
+        'через WSGI и ASGI под одновременной нагрузкой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument(
+            '--latency', type=float, default=0.0,
+            help='Задержка каждого SQL-запроса, мс (база по сети).',
+        )
+        parser.add_argument('--output', help='Куда сохранить JSON.')
+
+    def handle(self, *args, **options):
+        results = benchmark.throughput(
+            requests=options['requests'],
+            concurrency=options['concurrency'],
+            latency=options['latency'] / 1000,
+            log=self.stdout.write,
+        )
+        if options['output']:
+            benchmark.dump(results, options['output'])
+        speedup = (
+            results['asgi']['requests_per_s']
+            / results['wsgi']['requests_per_s']
+        )
+        self.stdout.write(f'ASGI быстрее WSGI в {speedup:.2f} раза')
@@ -0,0 +1,23 @@
+from core import benchmark
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу данными для нагрузочных замеров.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=2000000)
+        parser.add_argument('--follows', type=int, default=200000)
+
+    def handle(self, *args, **options):
+        benchmark.seed(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            log=self.stdout.write,
+        )
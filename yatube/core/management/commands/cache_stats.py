@@ -0,0 +1,24 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания, промахи и вытеснения кэша по префиксам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default')
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not hasattr(cache, 'stats'):
+            raise CommandError('Бэкенд кэша не собирает статистику.')
+        count, size = cache.totals()
+        self.stdout.write(f'Записей: {count}, объём: {size / 2 ** 20:.1f} МиБ')
+        for prefix, stats in cache.stats().items():
+            lookups = stats['hits'] + stats['misses']
+            ratio = stats['hits'] / lookups if lookups else 0
+            self.stdout.write(
+                f"{prefix}: попаданий {stats['hits']}, промахов "
+                f"{stats['misses']} ({ratio:.0%}), записей {stats['sets']}, "
+                f"вытеснено {stats['evictions']}"
+            )
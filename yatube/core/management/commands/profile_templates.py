@@ -0,0 +1,33 @@
+from core import benchmark
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Раскладывает время отрисовки страниц posts и about по шаблонам '
+        'и include, по убыванию собственного времени.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument(
+            '--keep-cache', action='store_true',
+            help='Не очищать кэш перед запросами.',
+        )
+        parser.add_argument('--output', help='Куда сохранить JSON.')
+
+    def handle(self, *args, **options):
+        results = benchmark.profile_templates(
+            requests=options['requests'],
+            keep_cache=options['keep_cache'],
+        )
+        if options['output']:
+            benchmark.dump(results, options['output'])
+        self.stdout.write(
+            f"{'шаблон':<45} {'раз':>7} {'всего, мс':>12} {'своё, мс':>12}"
+        )
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:<45} {stats['count']:>7} "
+                f"{stats['total_ms']:>12.3f} {stats['self_ms']:>12.3f}"
+            )
@@ -0,0 +1,40 @@
+import signal
+
+from core import queue
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Воркер очереди фоновых задач; останавливается по SIGTERM.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue', action='append', dest='queues',
+            help='Очередь (можно несколько), по умолчанию default.',
+        )
+        parser.add_argument(
+            '--threads', type=int,
+            help='Потоков; по умолчанию TASKS_WORKER_THREADS.',
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза между опросами пустой очереди, с.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        worker = queue.Worker(
+            queues=options['queues'] or ['default'],
+            threads=options['threads'],
+            poll=options['poll'],
+        )
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: worker.stop())
+        metrics = worker.run(once=options['once'])
+        self.stdout.write(
+            ', '.join(f'{name}: {count}' for name, count in metrics.items())
+            or 'Задач не было'
+        )
@@ -0,0 +1,22 @@
+import json
+
+from core import queue
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Число задач по состояниям, среднее время и задержка очереди.'
+
+    def handle(self, *args, **options):
+        stats = queue.stats()
+        self.stdout.write(json.dumps(stats, ensure_ascii=False, indent=2))
+        stalled = sorted(
+            name for name, metrics in stats.items()
+            if metrics.get('stalled')
+        )
+        if stalled:
+            self.stderr.write(
+                f'Задачи ждут дольше {settings.TASKS_STALLED_AFTER} с, '
+                f'запущен ли run_tasks? {", ".join(stalled)}'
+            )
@@ -0,0 +1,189 @@
+import json
+import logging
+import mimetypes
+import os
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from . import db_router, instrumentation, staticfiles
+
+logger = logging.getLogger('yatube.requests')
+
+
+class InstrumentationMiddleware:
+    """Замеры SQL, шаблонов и кэша для каждого запроса.
+
+    Итог отдаётся в заголовке ``Server-Timing``, часть запросов
+    (``INSTRUMENTATION_SAMPLE_RATE``) пишется в журнал одной JSON-строкой.
+    Повторяющиеся SQL-запросы (признак N+1) журналируются на уровне
+    DEBUG вместе с именем представления, кроме запросов к таблицам из
+    ``INSTRUMENTATION_DUPLICATE_IGNORE``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics, token = instrumentation.start()
+        request.metrics = metrics
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(
+                        instrumentation.execute_wrapper
+                    ))
+                response = self.get_response(request)
+        finally:
+            instrumentation.finish(token)
+        view_name = getattr(request.resolver_match, 'view_name', None)
+        response['Server-Timing'] = _server_timing(metrics)
+        duplicates = metrics.duplicates(
+            settings.INSTRUMENTATION_DUPLICATE_THRESHOLD,
+            settings.INSTRUMENTATION_DUPLICATE_IGNORE,
+        )
+        if duplicates and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'Повторяющиеся запросы в %s: %s',
+                view_name,
+                json.dumps(
+                    [
+                        {'sql': sql, 'count': count}
+                        for sql, count in duplicates.items()
+                    ],
+                    ensure_ascii=False,
+                ),
+            )
+        if random.random() < settings.INSTRUMENTATION_SAMPLE_RATE:
+            logger.info(json.dumps({
+                'view': view_name,
+                'method': request.method,
+                'status': response.status_code,
+                'total_ms': _ms(metrics.total_time),
+                'db_ms': _ms(metrics.db_time),
+                'queries': metrics.queries,
+                'duplicate_queries': sum(duplicates.values()),
+                'template_ms': _ms(metrics.template_time),
+                'pool_wait_ms': _ms(metrics.pool_wait),
+                'templates': {
+                    name: {
+                        'count': count,
+                        'total_ms': _ms(total),
+                        'self_ms': _ms(own),
+                    }
+                    for name, (count, total, own) in metrics.templates.items()
+                },
+                'cache': dict(metrics.cache),
+            }))
+        return response
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def _server_timing(metrics):
+    entries = [
+        f'db;dur={_ms(metrics.db_time)};desc="{metrics.queries} queries"',
+        f'tpl;dur={_ms(metrics.template_time)}',
+        f'pool;dur={_ms(metrics.pool_wait)}',
+    ]
+    entries.extend(
+        f'cache;desc="{name}"' for name in sorted(metrics.cache)
+    )
+    entries.append(f'total;dur={_ms(metrics.total_time)}')
+    return ', '.join(entries)
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет чтение за основной базой после записи.
+
+    Cookie живёт ``REPLICA_PIN_SECONDS`` — столько, сколько реплика
+    может отставать.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state, token = db_router.start(
+            pinned=db_router.PIN_COOKIE in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            db_router.finish(token)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                db_router.PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную ``collectstatic`` статику без веб-сервера.
+
+    Файлы с хэшем в имени кэшируются навсегда (``immutable``), остальные
+    на ``STATIC_MAX_AGE`` секунд. Сжатая копия выбирается по
+    ``Accept-Encoding``. Список файлов читается при запуске, поэтому
+    после ``collectstatic`` процесс нужно перезапустить. В режиме
+    ``DEBUG`` статику отдаёт ``runserver``.
+    """
+
+    def __init__(self, get_response):
+        root = settings.STATIC_ROOT
+        if settings.DEBUG or not root or not os.path.isdir(root):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.files = staticfiles.index(root)
+        self.immutable = staticfiles.hashed_names(root)
+
+    def __call__(self, request):
+        if (
+            request.method in ('GET', 'HEAD')
+            and request.path.startswith(settings.STATIC_URL)
+        ):
+            name = request.path[len(settings.STATIC_URL):]
+            if name in self.files:
+                return self.serve(request, name)
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        variants = self.files[name]
+        encoding = next(
+            (
+                encoding for encoding in staticfiles.accepted_encodings(
+                    request.META.get('HTTP_ACCEPT_ENCODING', '')
+                )
+                if encoding in variants
+            ),
+            None,
+        )
+        content_type, _ = mimetypes.guess_type(name)
+        response = FileResponse(
+            open(variants[encoding], 'rb'),
+            content_type=content_type or 'application/octet-stream',
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if len(variants) > 1:
+            patch_vary_headers(response, ['Accept-Encoding'])
+        if name in self.immutable:
+            patch_cache_control(
+                response, public=True, max_age=365 * 24 * 60 * 60,
+                immutable=True,
+            )
+        else:
+            patch_cache_control(
+                response, public=True, max_age=settings.STATIC_MAX_AGE
+            )
+        return response
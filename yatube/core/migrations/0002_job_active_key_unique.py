@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='job',
+            name='job_key_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('pending', 'running')), models.Q(_negated=True, key='')), fields=('key',), name='job_active_key_unique'),
+        ),
+    ]
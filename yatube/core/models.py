@@ -0,0 +1,81 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди (см. ``core.queue``)."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(verbose_name='Задача', max_length=200)
+    queue = models.CharField(
+        verbose_name='Очередь', max_length=50, default='default'
+    )
+    payload = models.TextField(verbose_name='Аргументы', default='[[], {}]')
+    key = models.CharField(
+        verbose_name='Ключ уникальности', max_length=32, blank=True
+    )
+    status = models.CharField(
+        verbose_name='Состояние',
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveIntegerField(
+        verbose_name='Попыток', default=0
+    )
+    max_attempts = models.PositiveIntegerField(
+        verbose_name='Попыток не больше', default=5
+    )
+    run_at = models.DateTimeField(
+        verbose_name='Выполнить после', default=timezone.now
+    )
+    created = models.DateTimeField(
+        verbose_name='Поставлена', auto_now_add=True
+    )
+    locked_by = models.CharField(
+        verbose_name='Воркер', max_length=100, blank=True
+    )
+    locked_at = models.DateTimeField(
+        verbose_name='Взята', null=True, blank=True
+    )
+    finished = models.DateTimeField(
+        verbose_name='Завершена', null=True, blank=True
+    )
+    duration = models.FloatField(
+        verbose_name='Длительность, с', null=True, blank=True
+    )
+    last_error = models.TextField(verbose_name='Последняя ошибка', blank=True)
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+    class Meta:
+        ordering = ('run_at', 'id')
+        indexes = (
+            models.Index(
+                fields=('status', 'queue', 'run_at'), name='job_ready_idx'
+            ),
+        )
+        constraints = (
+            # Уникальная задача с теми же аргументами ждёт или выполняется
+            # не больше одной, даже если два запроса ставят её разом.
+            models.UniqueConstraint(
+                fields=('key',),
+                condition=(
+                    models.Q(status__in=('pending', 'running'))
+                    & ~models.Q(key='')
+                ),
+                name='job_active_key_unique',
+            ),
+        )
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
@@ -0,0 +1,120 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SEPARATOR = '|'
+
+
+def encode_cursor(value, pk):
+    """Кодирует позицию (значение ключа, id) в строку для URL."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = f'{value}{CURSOR_SEPARATOR}{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, parse=parse_datetime):
+    """Возвращает (значение ключа, id) или None для битого курсора.
+
+    ``parse`` превращает строку в значение ключа: дату или, например,
+    ``float`` для числового рейтинга.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(
+            cursor + '=' * (-len(cursor) % 4)
+        ).decode()
+        value, pk = raw.rsplit(CURSOR_SEPARATOR, 1)
+        value = parse(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по паре (key, id) от новых записей к старым.
+
+    Страница выбирается запросом ``WHERE (key, id) < cursor LIMIT n + 1``
+    без ``COUNT(*)`` и ``OFFSET``. Номера страниц (``?page=N``) работают
+    как раньше через базовый ``Paginator``. ``parse`` читает значение
+    ключа из курсора (см. ``decode_cursor``). С ``ascending`` записи идут
+    от старых к новым, и условие становится ``(key, id) > cursor``.
+    """
+
+    def __init__(self, object_list, per_page, key='pub_date',
+                 parse=parse_datetime, ascending=False, **kwargs):
+        self.key = key
+        self.parse = parse
+        self.ascending = ascending
+        ordering = (key, 'pk') if ascending else (f'-{key}', '-pk')
+        super().__init__(
+            object_list.order_by(*ordering), per_page, **kwargs
+        )
+
+    def get_page(self, number=None, after=None, before=None):
+        if number is not None and after is None and before is None:
+            return super().get_page(number)
+        if before is not None:
+            position = decode_cursor(before, self.parse)
+            if position is not None:
+                return self._page_before(position)
+        position = None
+        if after is not None:
+            position = decode_cursor(after, self.parse)
+        return self._page_after(position)
+
+    def older_than(self, position):
+        """Записи после позиции курсора в порядке ленты."""
+        return self._beyond(position, 'gt' if self.ascending else 'lt')
+
+    def newer_than(self, position):
+        """Записи до позиции курсора, начиная с ближайшей к ней."""
+        return self._beyond(
+            position, 'lt' if self.ascending else 'gt'
+        ).reverse()
+
+    def _beyond(self, position, lookup):
+        value, pk = position
+        return self.object_list.filter(
+            Q(**{f'{self.key}__{lookup}': value})
+            | Q(**{self.key: value, f'pk__{lookup}': pk})
+        )
+
+    def _page_after(self, position):
+        queryset = self.object_list
+        if position is not None:
+            queryset = self.older_than(position)
+        items = list(queryset[:self.per_page + 1])
+        has_next = len(items) > self.per_page
+        items = items[:self.per_page]
+        return self._cursor_page(
+            items, has_previous=position is not None, has_next=has_next
+        )
+
+    def _page_before(self, position):
+        items = list(self.newer_than(position)[:self.per_page + 1])
+        has_previous = len(items) > self.per_page
+        items = items[:self.per_page][::-1]
+        return self._cursor_page(
+            items, has_previous=has_previous, has_next=True
+        )
+
+    def _cursor_page(self, items, has_previous, has_next):
+        page = Page(items, 1, self)
+        page.is_cursor = True
+        page.previous_cursor = None
+        page.next_cursor = None
+        if items and has_previous:
+            page.previous_cursor = self._encode(items[0])
+        if items and has_next:
+            page.next_cursor = self._encode(items[-1])
+        return page
+
+    def _encode(self, obj):
+        return encode_cursor(getattr(obj, self.key), obj.pk)
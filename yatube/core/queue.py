@@ -0,0 +1,346 @@
+"""Очередь фоновых задач в таблице базы данных.
+
+Функция с декоратором ``@task`` ставится в очередь вызовом
+``func.delay(*args, **kwargs)``: аргументы сохраняются в JSON в строке
+``Job`` той же транзакции, что и данные запроса, так что задача не
+увидит неотменённых изменений и не потеряется при откате. Запрос сразу
+возвращает ответ, а выполняет задачи команда ``run_tasks``.
+
+Воркер забирает задачу атомарным ``UPDATE ... WHERE status = 'pending'``,
+поэтому воркеров может быть сколько угодно, в том числе на SQLite.
+Упавшая задача повторяется через ``retry_delay * 2^(попытка - 1)``
+секунд, пока не кончатся ``max_attempts``. ``concurrency`` ограничивает
+число одновременно выполняемых задач одного вида на всех воркерах
+(проверяется при захвате, поэтому два воркера в один момент могут
+превысить его на единицу). Задача, которая выполняется дольше
+``TASKS_TIMEOUT``, считается брошенной упавшим воркером и возвращается
+в очередь.
+
+Воркер обязателен: без него ленты подписок не получают посты, а
+миниатюры не создаются. Задачи, которые ждут дольше
+``TASKS_STALLED_AFTER`` секунд, ``stats()`` помечает как ``stalled``.
+
+Каждая завершённая задача пишется в журнал ``yatube.tasks`` с временем
+ожидания в очереди и выполнения, ``stats()`` сводит то же по таблице.
+С ``TASKS_EAGER`` (в тестах) задача выполняется сразу в ``delay()``;
+с ``TASKS_EAGER_PROPAGATES`` её исключение выходит из ``delay()``, иначе
+только пишется в журнал.
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Avg, Count, F, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger('yatube.tasks')
+
+# Как часто воркер ищет брошенные задачи и удаляет выполненные.
+STALE_INTERVAL = 60
+PURGE_INTERVAL = 60 * 60
+
+
+class Task:
+    """Функция, которую можно выполнить в фоне через ``delay()``."""
+
+    def __init__(self, func, queue='default', max_attempts=None,
+                 retry_delay=None, concurrency=None, unique=False):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.concurrency = concurrency
+        self.unique = unique
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def get_max_attempts(self):
+        return self.max_attempts or settings.TASKS_MAX_ATTEMPTS
+
+    def get_retry_delay(self, attempts):
+        delay = self.retry_delay or settings.TASKS_RETRY_DELAY
+        return delay * 2 ** (attempts - 1)
+
+    def get_concurrency(self):
+        if callable(self.concurrency):
+            return self.concurrency()
+        return self.concurrency
+
+    def delay(self, *args, **kwargs):
+        return enqueue(self, args, kwargs)
+
+
+def task(func=None, **options):
+    """Декоратор фоновой задачи; параметры см. у ``Task``."""
+    if func is None:
+        return functools.partial(task, **options)
+    return Task(func, **options)
+
+
+def get_task(name):
+    """Задача по имени; из базы вызываются только функции с ``@task``."""
+    try:
+        found = import_string(name)
+    except ImportError:
+        return None
+    return found if isinstance(found, Task) else None
+
+
+def enqueue(task, args=(), kwargs=None, delay=0):
+    """Ставит задачу в очередь; возвращает ``Job`` или None.
+
+    Уникальная задача (``unique``) с теми же аргументами, которая уже
+    ждёт или выполняется, повторно не ставится: это проверяет частичный
+    уникальный индекс ``job_active_key_unique``, поэтому гонка двух
+    запросов тоже не создаёт дубль.
+    """
+    payload = json.dumps(
+        [list(args), kwargs or {}], cls=DjangoJSONEncoder, sort_keys=True
+    )
+    if settings.TASKS_EAGER:
+        _call(task, payload)
+        return None
+    key = ''
+    if task.unique:
+        key = hashlib.md5(f'{task.name}|{payload}'.encode()).hexdigest()
+    try:
+        # Точка сохранения: ошибка вставки не ломает транзакцию запроса.
+        with transaction.atomic():
+            return Job.objects.create(
+                name=task.name,
+                queue=task.queue,
+                payload=payload,
+                key=key,
+                max_attempts=task.get_max_attempts(),
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        return None
+
+
+def _call(task, payload):
+    args, kwargs = json.loads(payload)
+    try:
+        task(*args, **kwargs)
+    except Exception:
+        if settings.TASKS_EAGER_PROPAGATES:
+            raise
+        logger.exception('Задача %s упала', task.name)
+
+
+def _log(job, status, started):
+    logger.info(json.dumps({
+        'task': job.name,
+        'id': job.pk,
+        'status': status,
+        'attempt': job.attempts,
+        'wait_ms': round((started - job.run_at).total_seconds() * 1000, 2),
+        'run_ms': round(
+            (timezone.now() - started).total_seconds() * 1000, 2
+        ),
+    }))
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи воркеров, которые не ответили."""
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(
+            seconds=settings.TASKS_TIMEOUT
+        ),
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, last_error='Превышено время выполнения'
+    )
+    return failed + stale.update(status=Job.PENDING, locked_by='')
+
+
+def purge():
+    """Удаляет выполненные задачи старше ``TASKS_RETENTION``."""
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE,
+        finished__lt=timezone.now() - timedelta(
+            seconds=settings.TASKS_RETENTION
+        ),
+    ).delete()
+    return deleted
+
+
+def stats():
+    """``{задача: {состояние: число, avg_ms, oldest_pending_s, stalled}}``.
+
+    ``stalled`` — задача ждёт дольше ``TASKS_STALLED_AFTER``: скорее
+    всего, воркер не запущен.
+    """
+    result = {}
+    for name, status, count in Job.objects.order_by().values_list(
+        'name', 'status'
+    ).annotate(count=Count('pk')):
+        result.setdefault(name, {})[status] = count
+    now = timezone.now()
+    for name, duration, oldest in Job.objects.order_by().values_list(
+        'name'
+    ).annotate(
+        duration=Avg('duration', filter=Q(status=Job.DONE)),
+        oldest=Min('run_at', filter=Q(status=Job.PENDING)),
+    ):
+        metrics = result.setdefault(name, {})
+        if duration is not None:
+            metrics['avg_ms'] = round(duration * 1000, 2)
+        if oldest is not None:
+            metrics['oldest_pending_s'] = round(
+                max((now - oldest).total_seconds(), 0), 1
+            )
+            metrics['stalled'] = (
+                metrics['oldest_pending_s'] > settings.TASKS_STALLED_AFTER
+            )
+    return result
+
+
+class Worker:
+    """Выполняет задачи из очередей ``queues`` в ``threads`` потоках."""
+
+    def __init__(self, queues=('default',), threads=None, poll=1.0,
+                 name=None):
+        self.queues = list(queues)
+        self.threads = threads or settings.TASKS_WORKER_THREADS
+        self.poll = poll
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.metrics = Counter()
+        self._metrics_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def count(self, metric, value=1):
+        with self._metrics_lock:
+            self.metrics[metric] += value
+
+    def claim(self, limit):
+        """До ``limit`` задач, которые пора выполнять; помечает их своими."""
+        now = timezone.now()
+        running = Counter(dict(
+            Job.objects.filter(status=Job.RUNNING).order_by().values_list(
+                'name'
+            ).annotate(count=Count('pk'))
+        ))
+        claimed = []
+        for job in Job.objects.filter(
+            status=Job.PENDING, queue__in=self.queues, run_at__lte=now
+        )[:limit * 4]:
+            if len(claimed) == limit:
+                break
+            task = get_task(job.name)
+            if task is None:
+                Job.objects.filter(pk=job.pk).update(
+                    status=Job.FAILED, last_error='Неизвестная задача'
+                )
+                continue
+            concurrency = task.get_concurrency()
+            if concurrency and running[job.name] >= concurrency:
+                continue
+            if Job.objects.filter(pk=job.pk, status=Job.PENDING).update(
+                status=Job.RUNNING,
+                locked_by=self.name,
+                locked_at=now,
+                attempts=job.attempts + 1,
+            ):
+                job.attempts += 1
+                running[job.name] += 1
+                claimed.append(job)
+        self.count('claimed', len(claimed))
+        return claimed
+
+    def execute(self, job):
+        """Выполняет задачу и записывает результат; вызывается в потоке."""
+        task = get_task(job.name)
+        started = timezone.now()
+        clock = time.monotonic()
+        mine = Job.objects.filter(pk=job.pk, locked_by=self.name)
+        try:
+            args, kwargs = json.loads(job.payload)
+            task(*args, **kwargs)
+        except Exception:
+            error = traceback.format_exc()
+            if job.attempts < job.max_attempts:
+                status = Job.PENDING
+                mine.update(
+                    status=status,
+                    locked_by='',
+                    run_at=timezone.now() + timedelta(
+                        seconds=task.get_retry_delay(job.attempts)
+                    ),
+                    last_error=error,
+                )
+                self.count('retried')
+            else:
+                status = Job.FAILED
+                mine.update(
+                    status=status, finished=timezone.now(), last_error=error
+                )
+                self.count('failed')
+            logger.warning(
+                'Задача %s #%s упала:\n%s', job.name, job.pk, error
+            )
+        else:
+            status = Job.DONE
+            mine.update(
+                status=status,
+                finished=timezone.now(),
+                duration=time.monotonic() - clock,
+            )
+            self.count('done')
+        finally:
+            close_old_connections()
+        _log(job, status, started)
+        return status
+
+    def run(self, once=False):
+        """Цикл воркера; с ``once`` выходит, когда очередь пуста."""
+        checked = purged = float('-inf')
+        running = set()
+        with ThreadPoolExecutor(
+            self.threads, thread_name_prefix='tasks'
+        ) as executor:
+            while not self._stopping.is_set():
+                if time.monotonic() - checked > STALE_INTERVAL:
+                    self.count('requeued', requeue_stale())
+                    checked = time.monotonic()
+                if time.monotonic() - purged > PURGE_INTERVAL:
+                    purge()
+                    purged = time.monotonic()
+                if len(running) < self.threads:
+                    running.update(
+                        executor.submit(self.execute, job)
+                        for job in self.claim(self.threads - len(running))
+                    )
+                if once and not running:
+                    break
+                if running:
+                    running = wait(
+                        running, self.poll, FIRST_COMPLETED
+                    ).not_done
+                else:
+                    self._stopping.wait(self.poll)
+            wait(running)
+        close_old_connections()
+        return self.metrics
@@ -0,0 +1,349 @@
+"""Общий для процессов кэш в файле SQLite.
+
+``LocMemCache`` у каждого воркера gunicorn свой, поэтому одна и та же
+страница кэшируется в каждом процессе отдельно, а ``bump`` в одном
+процессе не виден другим. Этот бэкенд хранит значения в одном файле
+SQLite (режим WAL), общем для всех процессов на машине, и не требует
+отдельного сервиса.
+
+Размер кэша ограничен числом записей (``MAX_ENTRIES``) и суммарным
+объёмом значений в байтах (``MAX_SIZE``). При переполнении удаляются
+давно не читавшиеся записи (LRU). Попадания, промахи, записи и
+вытеснения считаются по префиксу ключа — части до первого двоеточия
+(``page``, ``post-card``, ``generation``) — и видны в ``stats()`` и
+команде ``cache_stats``.
+
+Настройка::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.sqlite_cache.SQLiteCache',
+            'LOCATION': '/var/cache/yatube/cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_SIZE': 256 * 2 ** 20},
+        }
+    }
+"""
+import atexit
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    count INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE totals SET count = count + 1, size = size + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries
+BEGIN
+    UPDATE totals SET size = size + new.size - old.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE totals SET count = count - 1, size = size - old.size;
+END;
+CREATE TABLE IF NOT EXISTS stats (
+    prefix TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (prefix, name)
+);
+'''
+UPSERT = (
+    'INSERT INTO entries (key, value, expires, accessed, size) '
+    'VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+    'value = excluded.value, expires = excluded.expires, '
+    'accessed = excluded.accessed, size = excluded.size'
+)
+STATS = ('hits', 'misses', 'sets', 'evictions')
+
+
+def key_prefix(key):
+    return str(key).split(':', 1)[0]
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self.max_size = int(options.get('MAX_SIZE', 64 * 2 ** 20))
+        # Время последнего чтения обновляется не чаще, чем раз в столько
+        # секунд: для LRU большей точности не нужно, а запись дорога.
+        self.access_resolution = float(options.get('ACCESS_RESOLUTION', 1))
+        self.stats_interval = float(options.get('STATS_INTERVAL', 5))
+        self._local = threading.local()
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._stats_flushed = time.monotonic()
+        atexit.register(self.flush_stats)
+
+    def _connection(self):
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            directory = os.path.dirname(os.path.abspath(self.location))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.location, timeout=10, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    @contextmanager
+    def _write(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _count(self, prefix, name, value=1):
+        with self._stats_lock:
+            self._stats[prefix, name] += value
+
+    def _maybe_flush_stats(self):
+        # Счётчики копятся в процессе и пишутся в файл не чаще раза
+        # в STATS_INTERVAL секунд, чтобы чтение не становилось записью.
+        if time.monotonic() - self._stats_flushed > self.stats_interval:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Переносит счётчики процесса в общую таблицу."""
+        with self._stats_lock:
+            stats, self._stats = self._stats, Counter()
+            self._stats_flushed = time.monotonic()
+        if not stats:
+            return
+        with self._write() as connection:
+            connection.executemany(
+                'INSERT INTO stats VALUES (?, ?, ?) ON CONFLICT '
+                '(prefix, name) DO UPDATE SET value = value + excluded.value',
+                [(prefix, name, value) for (prefix, name), value in
+                 stats.items()],
+            )
+
+    def stats(self):
+        """``{префикс: {hits, misses, sets, evictions}}`` всех процессов."""
+        self.flush_stats()
+        result = {}
+        for prefix, name, value in self._connection().execute(
+            'SELECT prefix, name, value FROM stats ORDER BY prefix'
+        ):
+            result.setdefault(prefix, dict.fromkeys(STATS, 0))[name] = value
+        return result
+
+    def totals(self):
+        """Число записей и их объём в байтах."""
+        return self._connection().execute(
+            'SELECT count, size FROM totals'
+        ).fetchone()
+
+    def _fetch(self, keys):
+        """Живые значения по ключам хранилища, с отметкой о чтении."""
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        connection = self._connection()
+        rows = connection.execute(
+            f'SELECT key, value, accessed FROM entries WHERE key IN '
+            f'({placeholders}) AND (expires IS NULL OR expires > ?)',
+            [*keys, now],
+        ).fetchall()
+        stale = [
+            key for key, value, accessed in rows
+            if now - accessed > self.access_resolution
+        ]
+        if stale:
+            connection.execute(
+                f"UPDATE entries SET accessed = ? WHERE key IN "
+                f"({', '.join('?' * len(stale))})",
+                [now, *stale],
+            )
+        return {key: pickle.loads(value) for key, value, accessed in rows}
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        made = {self.make_key(key, version): key for key in keys}
+        for made_key in made:
+            self.validate_key(made_key)
+        found = self._fetch(list(made))
+        hits = Counter(key_prefix(made[key]) for key in found)
+        misses = Counter(
+            key_prefix(key) for made_key, key in made.items()
+            if made_key not in found
+        )
+        for prefix, value in hits.items():
+            self._count(prefix, 'hits', value)
+        for prefix, value in misses.items():
+            self._count(prefix, 'misses', value)
+        self._maybe_flush_stats()
+        return {made[key]: value for key, value in found.items()}
+
+    def _rows(self, data, timeout, version):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = []
+        for key, value in data.items():
+            made_key = self.make_key(key, version)
+            self.validate_key(made_key)
+            blob = pickle.dumps(value, self.pickle_protocol)
+            rows.append((made_key, blob, expires, now, len(blob)))
+            self._count(key_prefix(key), 'sets')
+        return rows
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = self._rows(data, timeout, version)
+        with self._write() as connection:
+            connection.executemany(UPSERT, rows)
+            self._cull(connection)
+        self._maybe_flush_stats()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = self._rows({key: value}, timeout, version)
+        with self._write() as connection:
+            # Существующую запись можно заменить, только если она истекла.
+            cursor = connection.execute(
+                UPSERT + ' WHERE expires IS NOT NULL '
+                'AND expires <= excluded.accessed',
+                rows[0],
+            )
+            added = cursor.rowcount > 0
+            if added:
+                self._cull(connection)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов: чтение и запись в одной транзакции."""
+        made_key = self.make_key(key, version)
+        self.validate_key(made_key)
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value FROM entries WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (made_key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            blob = pickle.dumps(value, self.pickle_protocol)
+            connection.execute(
+                'UPDATE entries SET value = ?, size = ? WHERE key = ?',
+                (blob, len(blob), made_key),
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key = self.make_key(key, version)
+        self.validate_key(made_key)
+        with self._write() as connection:
+            return connection.execute(
+                'UPDATE entries SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), made_key, time.time()),
+            ).rowcount > 0
+
+    def has_key(self, key, version=None):
+        made_key = self.make_key(key, version)
+        self.validate_key(made_key)
+        return self._connection().execute(
+            'SELECT 1 FROM entries WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (made_key, time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        made_keys = [self.make_key(key, version) for key in keys]
+        for made_key in made_keys:
+            self.validate_key(made_key)
+        with self._write() as connection:
+            connection.executemany(
+                'DELETE FROM entries WHERE key = ?',
+                [(made_key,) for made_key in made_keys],
+            )
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM entries')
+            connection.execute('DELETE FROM stats')
+        with self._stats_lock:
+            self._stats.clear()
+
+    def _cull(self, connection):
+        """Удаляет просроченные, затем давно не читавшиеся записи."""
+        count, size = connection.execute(
+            'SELECT count, size FROM totals'
+        ).fetchone()
+        if count <= self._max_entries and size <= self.max_size:
+            return
+        connection.execute(
+            'DELETE FROM entries WHERE expires IS NOT NULL AND expires <= ?',
+            (time.time(),),
+        )
+        # Как и у встроенных бэкендов, освобождаем сразу 1/CULL_FREQUENCY
+        # кэша, чтобы не чистить его при каждой записи.
+        keep = 1 - 1 / self._cull_frequency if self._cull_frequency else 0
+        evicted = Counter()
+        rows = connection.execute(
+            'SELECT key, size FROM entries ORDER BY accessed'
+        )
+        count, size = connection.execute(
+            'SELECT count, size FROM totals'
+        ).fetchone()
+        doomed = []
+        for key, entry_size in rows:
+            if (
+                count <= self._max_entries * keep
+                and size <= self.max_size * keep
+            ):
+                break
+            doomed.append((key,))
+            count -= 1
+            size -= entry_size
+            evicted[key_prefix(key.split(':', 2)[-1])] += 1
+        rows.close()
+        connection.executemany('DELETE FROM entries WHERE key = ?', doomed)
+        for prefix, value in evicted.items():
+            self._count(prefix, 'evictions', value)
+
+    def close(self, **kwargs):
+        # Django закрывает кэши после каждого запроса; соединение с файлом
+        # кэша дешевле держать открытым весь срок жизни потока.
+        pass
@@ -0,0 +1,244 @@
+"""Сборка статики для продакшена.
+
+``collectstatic`` с ``CompressedManifestStaticFilesStorage`` склеивает
+таблицы стилей из ``STATIC_BUNDLES`` в один минифицированный файл,
+оставляет в ionicons только иконки из шаблонов (и, если установлен
+fontTools, только их глифы в шрифтах), добавляет в имена файлов хэш
+содержимого и кладёт рядом сжатые копии ``.gz`` (и ``.br``, если
+установлен brotli). ``StaticFilesMiddleware`` отдаёт их с заголовками
+для вечного кэширования.
+"""
+import gzip
+import json
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.template.utils import get_app_template_dirs
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    from fontTools import subset
+except ImportError:
+    subset = None
+
+COMPRESSIBLE = ('.css', '.js', '.json', '.svg', '.txt', '.xml', '.ttf')
+# Сжатая копия не нужна, если экономит меньше 5%.
+MIN_RATIO = 0.95
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+ICONS = 'css/ionicons.min.css'
+FONT_FORMATS = {'woff2': 'woff2', 'woff': 'woff', 'ttf': 'truetype'}
+
+_STRING = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_RULE = re.compile(r'([^{}]+)\{([^{}]*)\}')
+_ICON = re.compile(r'\.ion-([a-z0-9-]+)')
+_CODEPOINT = re.compile(r'content:\s*"\\([0-9a-f]+)"', re.I)
+_FONT_URL = re.compile(r'url\("?([^")?#]+)[^")]*"?\)')
+_USED_ICON = re.compile(r'\bion-([a-z0-9-]+)')
+
+
+def minify_css(css):
+    """Убирает комментарии и лишние пробелы, не трогая строки."""
+    parts = _STRING.split(_COMMENT.sub('', css))
+    for index in range(0, len(parts), 2):
+        code = re.sub(r'\s+', ' ', parts[index])
+        code = re.sub(r' ?([{};,>]) ?', r'\1', code)
+        parts[index] = re.sub(r': ', ':', code).replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def used_icons():
+    """Имена иконок ionicons (``ion-*``) из всех шаблонов."""
+    dirs = [
+        *(path for engine in settings.TEMPLATES for path in engine['DIRS']),
+        *get_app_template_dirs('templates'),
+    ]
+    icons = set()
+    for directory in dirs:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith('.html'):
+                    path = os.path.join(root, name)
+                    with open(path, encoding='utf-8') as file:
+                        icons.update(_USED_ICON.findall(file.read()))
+    return icons
+
+
+def _extension(name):
+    return name.rsplit('.', 1)[-1]
+
+
+def font_urls(css):
+    """Адреса шрифтов из ``url()``, от предпочтительного формата."""
+    return sorted(
+        {
+            url for url in _FONT_URL.findall(css)
+            if _extension(url) in FONT_FORMATS
+        },
+        key=lambda url: list(FONT_FORMATS).index(_extension(url)),
+    )
+
+
+def _font_face(declarations):
+    urls = font_urls(declarations)
+    kept = [
+        declaration for declaration in declarations.split(';')
+        if declaration and not declaration.startswith('src:')
+    ]
+    src = ','.join(
+        f'url("{url}") format("{FONT_FORMATS[_extension(url)]}")'
+        for url in urls
+    )
+    return ';'.join([*kept, f'src:{src}'])
+
+
+def prune_icons(css, icons):
+    """Оставляет в ionicons правила только для ``icons``.
+
+    Bootstrap 5 не поддерживает IE, поэтому из ``@font-face`` уходят
+    форматы eot и svg.
+    """
+    rules = []
+    for selectors, declarations in _RULE.findall(_COMMENT.sub('', css)):
+        selectors = selectors.replace('@charset "UTF-8";', '').strip()
+        if selectors == '@font-face':
+            rules.append(f'@font-face{{{_font_face(declarations)}}}')
+            continue
+        kept = [
+            selector for selector in selectors.split(',')
+            if not _ICON.search(selector)
+            or _ICON.search(selector).group(1) in icons
+        ]
+        if kept:
+            rules.append(f"{','.join(kept)}{{{declarations}}}")
+    return ''.join(rules)
+
+
+def bundle(storage, sources, icons):
+    parts = []
+    for source in sources:
+        with storage.open(source) as file:
+            css = file.read().decode('utf-8')
+        if source == ICONS:
+            css = prune_icons(css, icons)
+        parts.append(minify_css(css).replace('@charset "UTF-8";', ''))
+    return '@charset "UTF-8";' + '\n'.join(parts)
+
+
+def subset_font(storage, name, codepoints):
+    """Оставляет в шрифте только глифы ``codepoints``."""
+    options = subset.Options()
+    flavor = _extension(name)
+    options.flavor = flavor if flavor in ('woff', 'woff2') else None
+    with storage.open(name) as file:
+        font = subset.load_font(file, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    storage.delete(name)
+    with storage.open(name, 'wb') as file:
+        subset.save_font(font, file, options)
+
+
+def compress(storage, name):
+    """Кладёт рядом с файлом его сжатые копии; возвращает их имена."""
+    with storage.open(name) as file:
+        content = file.read()
+    compressed = {'.gz': gzip.compress(content, 9, mtime=0)}
+    if brotli is not None:
+        compressed['.br'] = brotli.compress(content)
+    names = []
+    for suffix, data in compressed.items():
+        if len(data) < len(content) * MIN_RATIO:
+            if storage.exists(name + suffix):
+                storage.delete(name + suffix)
+            names.append(storage.save(name + suffix, ContentFile(data)))
+    return names
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def build_bundles(self):
+        icons = used_icons()
+        for name, sources in settings.STATIC_BUNDLES.items():
+            content = bundle(self, sources, icons)
+            if subset is not None:
+                codepoints = {
+                    int(code, 16) for code in _CODEPOINT.findall(content)
+                }
+                for url in font_urls(content):
+                    subset_font(self, os.path.normpath(
+                        os.path.join(os.path.dirname(name), url)
+                    ), codepoints)
+            if self.exists(name):
+                self.delete(name)
+            self.save(name, ContentFile(content.encode('utf-8')))
+            yield name
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for name in self.build_bundles():
+                paths[name] = (self, name)
+        yield from super().post_process(paths, dry_run, **options)
+        if not dry_run:
+            for name in set(self.hashed_files.values()):
+                if name.endswith(COMPRESSIBLE):
+                    compress(self, name)
+
+
+def hashed_names(root):
+    """Имена файлов с хэшем содержимого из манифеста ``collectstatic``."""
+    path = os.path.join(root, ManifestStaticFilesStorage.manifest_name)
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as file:
+        return set(json.load(file)['paths'].values())
+
+
+def accepted_encodings(header):
+    """Кодировки из ``Accept-Encoding`` с весом больше нуля.
+
+    Кодировка без своей записи берёт вес ``*``; ``q=0`` запрещает её.
+    Порядок — как в ``ENCODINGS``, то есть предпочтение сервера.
+    """
+    weights = {}
+    for item in header.split(','):
+        token, *params = (part.strip() for part in item.split(';'))
+        if not token:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[token.lower()] = weight
+    return [
+        encoding for encoding, _ in ENCODINGS
+        if weights.get(encoding, weights.get('*', 0.0)) > 0
+    ]
+
+
+def index(root):
+    """``{имя: {кодировка или None: путь}}`` для всех собранных файлов."""
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            if name.endswith(('.gz', '.br')):
+                continue
+            variants = files.setdefault(
+                os.path.relpath(path, root).replace(os.sep, '/'), {}
+            )
+            variants[None] = path
+            for encoding, suffix in ENCODINGS:
+                if os.path.exists(path + suffix):
+                    variants[encoding] = path + suffix
+    return files
@@ -0,0 +1,16 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+register = template.Library()
+
+
+@register.simple_tag
+def stylesheets(bundle):
+    """Бандл из STATIC_BUNDLES, а в режиме DEBUG — его исходники."""
+    names = settings.STATIC_BUNDLES[bundle] if settings.DEBUG else [bundle]
+    return format_html_join(
+        '\n', '<link rel="stylesheet" href="{}">',
+        ((static(name),) for name in names),
+    )
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+
+from django.http import parse_cookie
+from django.test import SimpleTestCase, TransactionTestCase
+
+from .. import benchmark
+from ..asgi import ASGIHandler, environ
+
+
+def request(application, path='/', method='GET', body=b'', headers=()):
+    """Ответ ASGI-приложения: (статус, заголовки, тело)."""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(application(
+        {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': b'',
+            'headers': list(headers),
+        },
+        receive,
+        send,
+    ))
+    return (
+        messages[0]['status'],
+        dict(messages[0]['headers']),
+        b''.join(message.get('body', b'') for message in messages[1:]),
+    )
+
+
+class ASGIHandlerTests(SimpleTestCase):
+    def test_environ(self):
+        """Заголовки и путь переводятся в WSGI-окружение."""
+        result = environ(
+            {
+                'type': 'http',
+                'method': 'POST',
+                'path': '/profile/ёж/',
+                'query_string': b'page=2',
+                'headers': [
+                    (b'content-type', b'text/plain'),
+                    (b'accept', b'text/html'),
+                    (b'accept', b'*/*'),
+                    (b'cookie', b'sessionid=abc'),
+                    (b'cookie', b'csrftoken=xyz'),
+                ],
+            },
+            None,
+        )
+        self.assertEqual(
+            result['PATH_INFO'].encode('latin-1').decode(), '/profile/ёж/'
+        )
+        self.assertEqual(result['QUERY_STRING'], 'page=2')
+        self.assertEqual(result['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(result['HTTP_ACCEPT'], 'text/html,*/*')
+        self.assertEqual(
+            parse_cookie(result['HTTP_COOKIE']),
+            {'sessionid': 'abc', 'csrftoken': 'xyz'},
+        )
+
+    def test_bounded_concurrency(self):
+        """Медленные запросы идут параллельно, но не больше пула."""
+        lock = threading.Lock()
+        active = [0, 0]
+
+        def slow(environ, start_response):
+            with lock:
+                active[0] += 1
+                active[1] = max(active)
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            start_response('200 OK', [])
+            return [b'ok']
+
+        async def load(application):
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(None, request, application)
+                for _ in range(6)
+            ))
+
+        for threads in (1, 3):
+            with self.subTest(threads=threads):
+                active[:] = [0, 0]
+                application = ASGIHandler(slow, read_threads=threads)
+                asyncio.run(load(application))
+                application.shutdown()
+                self.assertEqual(active[1], threads)
+
+    def test_write_pool_and_body(self):
+        """Запись выполняется в своём пуле и получает тело запроса."""
+        def echo(environ, start_response):
+            start_response(
+                '201 Created', [('X-Thread', threading.current_thread().name)]
+            )
+            return [environ['wsgi.input'].read()]
+
+        application = ASGIHandler(echo, read_threads=1, write_threads=1)
+        status, headers, body = request(
+            application, method='POST', body=b'text'
+        )
+        self.assertEqual(status, 201)
+        self.assertEqual(body, b'text')
+        self.assertTrue(headers[b'x-thread'].startswith(b'asgi-write'))
+        status, headers, body = request(application, method='HEAD')
+        self.assertTrue(headers[b'x-thread'].startswith(b'asgi-read'))
+        self.assertEqual(body, b'')
+        application.shutdown()
+
+
+class ASGIDjangoTests(TransactionTestCase):
+    def test_index(self):
+        """Django отвечает через ASGI так же, как через WSGI."""
+        application = ASGIHandler()
+        status, headers, body = request(application)
+        application.shutdown()
+        self.assertEqual(status, 200)
+        self.assertIn(b'text/html', headers[b'content-type'])
+        self.assertIn('Последние обновления'.encode(), body)
+
+    def test_throughput(self):
+        """Замер пропускной способности WSGI и ASGI без ошибок."""
+        benchmark.seed(
+            users=10, groups=2, posts=30, comments=30, follows=20,
+            log=lambda message: None,
+        )
+        results = benchmark.throughput(
+            requests=20, concurrency=4, latency=0.001,
+            log=lambda message: None,
+        )
+        for name in ('wsgi', 'asgi'):
+            with self.subTest(name=name):
+                self.assertEqual(results[name]['errors'], 0)
+                self.assertGreater(results[name]['requests_per_s'], 0)
@@ -0,0 +1,45 @@
+from django.test import TestCase
+
+from .. import benchmark
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        benchmark.seed(
+            users=20, groups=2, posts=200, comments=100, follows=60,
+            log=lambda message: None,
+        )
+
+    def test_measure_every_url(self):
+        """Замеры есть для каждого адреса posts и about, кроме записи."""
+        results = benchmark.measure(requests=2, log=lambda message: None)
+        self.assertIn('posts:index', results)
+        self.assertIn('about:tech', results)
+        self.assertNotIn('posts:profile_follow', results)
+        for name, metrics in results.items():
+            with self.subTest(name=name):
+                self.assertLess(metrics['status'], 500)
+                self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+
+    def test_regressions(self):
+        """Пороги и ухудшения относительно прошлого прогона."""
+        baseline = {'posts:index': {'p95_ms': 10, 'queries': 2}}
+        results = {'posts:index': {'p95_ms': 13, 'queries': 3}}
+        self.assertEqual(
+            len(benchmark.regressions(results, baseline=baseline)), 2
+        )
+        self.assertEqual(
+            benchmark.regressions(
+                results, thresholds={'*': {'queries': 3}}, tolerance=0.5
+            ),
+            [],
+        )
+
+    def test_profile_templates(self):
+        """Профиль шаблонов отсортирован по собственному времени."""
+        results = benchmark.profile_templates(requests=1)
+        self.assertIn('posts/includes/post_list.html', results)
+        own = [stats['self_ms'] for stats in results.values()]
+        self.assertEqual(own, sorted(own, reverse=True))
@@ -0,0 +1,103 @@
+import os
+import tempfile
+
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from .. import instrumentation
+from ..db import pool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+
+    def cursor(self):
+        if self.broken:
+            raise OSError('соединение разорвано')
+        return self
+
+    def execute(self, sql):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_reuse_and_overflow(self):
+        """Свободное соединение выдаётся снова, лишнее закрывается."""
+        connections = pool.ConnectionPool(size=1, max_overflow=1)
+        first = connections.acquire(FakeConnection)
+        second = connections.acquire(FakeConnection)
+        connections.release(first)
+        connections.release(second)
+        self.assertTrue(second.closed)
+        self.assertIs(connections.acquire(FakeConnection), first)
+        stats = connections.stats()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['acquired'], 3)
+        self.assertEqual(stats['open'], 1)
+
+    def test_timeout(self):
+        """Без свободных соединений запрос ждёт и получает ошибку."""
+        connections = pool.ConnectionPool(
+            size=1, max_overflow=0, timeout=0.01
+        )
+        connections.acquire(FakeConnection)
+        with self.assertRaises(pool.PoolTimeout):
+            connections.acquire(FakeConnection)
+        self.assertEqual(connections.stats()['timeouts'], 1)
+
+    def test_health_check_and_recycle(self):
+        """Сломанные и старые соединения заменяются новыми."""
+        connections = pool.ConnectionPool(size=2, check_interval=0)
+        broken = connections.acquire(FakeConnection)
+        connections.release(broken)
+        broken.broken = True
+        self.assertIsNot(connections.acquire(FakeConnection), broken)
+        self.assertTrue(broken.closed)
+        connections = pool.ConnectionPool(size=2, recycle=0)
+        old = connections.acquire(FakeConnection)
+        connections.release(old)
+        self.assertTrue(old.closed)
+
+    def test_wait_in_request_metrics(self):
+        """Время ожидания пула попадает в метрики запроса."""
+        metrics, token = instrumentation.start()
+        try:
+            pool.ConnectionPool().acquire(FakeConnection)
+        finally:
+            instrumentation.finish(token)
+        self.assertGreater(metrics.pool_wait, 0)
+
+
+class PooledBackendTests(SimpleTestCase):
+    def test_sqlite_pool_and_pragmas(self):
+        """Соединение Django возвращается в пул, PRAGMA применяются."""
+        with tempfile.TemporaryDirectory() as directory:
+            handler = ConnectionHandler({'default': {
+                'ENGINE': 'core.db.backends.sqlite3',
+                'NAME': os.path.join(directory, 'pooled.sqlite3'),
+                'OPTIONS': {
+                    'pool': {'size': 1},
+                    'pragmas': {'journal_mode': 'WAL', 'synchronous': 1},
+                },
+            }})
+            database = handler['default']
+            # Пул общий для алиаса, не смешиваем его с основной базой.
+            database.alias = 'pooled'
+            database.ensure_connection()
+            raw = database.connection
+            with database.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+            database.close()
+            database.ensure_connection()
+            self.assertIs(database.connection, raw)
+            database.close()
+            pool.get_pool('pooled', {}).close()
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import db_router
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = db_router.ReplicaRouter()
+        state, token = db_router.start()
+        self.addCleanup(db_router.finish, token)
+        self.state = state
+
+    def read(self):
+        return self.router.db_for_read(User)
+
+    def test_replica_only_in_marked_views(self):
+        """С реплики читают только представления ленты."""
+        self.assertEqual(self.read(), 'default')
+        db_router.use_replica(lambda request: self.assertEqual(
+            self.read(), 'replica'
+        ))(None)
+        self.assertTrue(db_router.replica_used())
+        self.assertEqual(self.read(), 'default')
+
+    def test_read_your_writes(self):
+        """После записи чтение идёт с основной базы."""
+        def view(request):
+            self.assertEqual(self.router.db_for_write(User), 'default')
+            self.assertEqual(self.read(), 'default')
+
+        db_router.use_replica(view)(None)
+        self.assertFalse(db_router.replica_used())
+
+    def test_pinned_client_reads_primary(self):
+        """Закреплённый клиент читает с основной базы."""
+        self.state.pinned = True
+        db_router.use_replica(
+            lambda request: self.assertEqual(self.read(), 'default')
+        )(None)
+
+    # Реплика здесь — тот же алиас default: настоящая копия не видела бы
+    # данных из незафиксированной транзакции теста.
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_pin_cookie_after_write(self):
+        """После записи клиент получает cookie закрепления."""
+        user = User.objects.create_user(username='auth')
+        self.client.force_login(user)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(db_router.PIN_COOKIE, response.cookies)
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertEqual(
+            response.cookies[db_router.PIN_COOKIE]['max-age'], 5
+        )
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.template import base
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail.models import KVStore
+
+from ..instrumentation import (disable_template_profiling,
+                               enable_template_profiling)
+from ..middleware import InstrumentationMiddleware
+
+User = get_user_model()
+
+
+class InstrumentationMiddlewareTests(TestCase):
+    def test_server_timing_header(self):
+        """Страница отдаёт замеры SQL, шаблонов и кэша."""
+        response = self.client.get(reverse('posts:index'))
+        header = response['Server-Timing']
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('tpl;dur=', header)
+        self.assertIn('cache;desc="index_page_miss"', header)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('cache;desc="index_page_hit"', response['Server-Timing'])
+
+    @override_settings(INSTRUMENTATION_DUPLICATE_THRESHOLD=3)
+    def test_duplicate_queries_logged(self):
+        """Повторяющиеся запросы пишутся в журнал отладки.
+
+        Запросы к таблицам из INSTRUMENTATION_DUPLICATE_IGNORE пропускаются.
+        """
+        def view(request):
+            for pk in range(3):
+                User.objects.filter(pk=pk).exists()
+                KVStore.objects.filter(key=str(pk)).exists()
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(view)
+        with self.assertLogs('yatube.requests', 'DEBUG') as logs:
+            middleware(RequestFactory().get('/'))
+        duplicates = [
+            record for record in logs.records
+            if record.getMessage().startswith('Повторяющиеся')
+        ]
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(duplicates[0].levelname, 'DEBUG')
+        self.assertIn('"count": 3', duplicates[0].getMessage())
+        self.assertNotIn('thumbnail_kvstore', duplicates[0].getMessage())
+
+    def test_template_profiling(self):
+        """Время отрисовки разнесено по шаблонам, include и родителям."""
+        self.assertTrue(enable_template_profiling())
+        self.addCleanup(disable_template_profiling)
+        self.assertFalse(enable_template_profiling())
+        author = User.objects.create_user(username='profiled')
+        author.posts.create(text='Пост для профилировщика')
+        templates = self.client.get(
+            reverse('posts:index')
+        ).wsgi_request.metrics.templates
+        for name in (
+            'posts/index.html', 'base.html', 'includes/header.html',
+            'posts/includes/post_list.html',
+        ):
+            with self.subTest(name=name):
+                count, total, own = templates[name]
+                self.assertGreaterEqual(count, 1)
+                self.assertLessEqual(own, total)
+        self.assertEqual(templates['base.html'][0], 1)
+
+    def test_template_profiling_disabled(self):
+        """Отключение профилировщика возвращает исходный метод."""
+        original = base.Template._render
+        enable_template_profiling()
+        disable_template_profiling()
+        self.assertIs(base.Template._render, original)
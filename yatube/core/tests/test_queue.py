@@ -0,0 +1,167 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import queue
+from ..models import Job
+
+User = get_user_model()
+
+calls = []
+
+
+@queue.task
+def record(value):
+    calls.append(value)
+
+
+@queue.task(max_attempts=2, retry_delay=60)
+def broken():
+    raise RuntimeError('сбой')
+
+
+@queue.task(concurrency=1, unique=True)
+def single(value):
+    calls.append(value)
+
+
+def make_ready(job):
+    Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+
+
+@override_settings(TASKS_EAGER=False)
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = queue.Worker(name='test')
+
+    def run_ready(self):
+        return [self.worker.execute(job) for job in self.worker.claim(10)]
+
+    def test_delay_and_execute(self):
+        """Задача ждёт воркера и выполняется с аргументами из JSON."""
+        job = record.delay({'text': 'пост'})
+        self.assertEqual(calls, [])
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(self.run_ready(), [Job.DONE])
+        self.assertEqual(calls, [{'text': 'пост'}])
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.duration)
+        self.assertEqual(self.worker.metrics['done'], 1)
+
+    def test_retry_then_fail(self):
+        """Упавшая задача откладывается, а после max_attempts — ошибка."""
+        job = broken.delay()
+        with self.assertLogs('yatube.tasks', 'WARNING'):
+            self.assertEqual(self.run_ready(), [Job.PENDING])
+        job.refresh_from_db()
+        self.assertIn('сбой', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(self.run_ready(), [])
+        make_ready(job)
+        with self.assertLogs('yatube.tasks', 'WARNING'):
+            self.assertEqual(self.run_ready(), [Job.FAILED])
+        self.assertEqual(
+            (self.worker.metrics['retried'], self.worker.metrics['failed']),
+            (1, 1),
+        )
+
+    def test_unique_and_concurrency(self):
+        """Уникальная задача не дублируется, лимит держит лишние в очереди."""
+        self.assertIsNotNone(single.delay(1))
+        self.assertIsNone(single.delay(1))
+        single.delay(2)
+        self.assertEqual(len(self.worker.claim(10)), 1)
+        self.assertEqual(self.worker.claim(10), [])
+
+    def test_unique_enforced_by_database(self):
+        """Дубль уникальной задачи отбрасывает индекс, а не проверка."""
+        job = single.delay(1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Job.objects.create(name=job.name, payload=job.payload, key=job.key)
+        Job.objects.filter(pk=job.pk).update(status=Job.DONE)
+        self.assertIsNotNone(single.delay(1))
+
+    def test_stale_and_unknown(self):
+        """Брошенные задачи возвращаются, неизвестные не выполняются."""
+        job = record.delay(1)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING,
+            attempts=1,
+            locked_at=timezone.now() - timedelta(days=1),
+        )
+        self.assertEqual(queue.requeue_stale(), 1)
+        unknown = Job.objects.create(name='os.system', payload='[["ls"], {}]')
+        self.assertEqual(self.run_ready(), [Job.DONE])
+        self.assertEqual(
+            Job.objects.get(pk=unknown.pk).status, Job.FAILED
+        )
+
+    def test_stats(self):
+        """Сводка по задачам: состояния, время и задержка очереди."""
+        record.delay(1)
+        self.run_ready()
+        record.delay(2)
+        stats = queue.stats()[record.name]
+        self.assertEqual((stats['done'], stats['pending']), (1, 1))
+        self.assertIn('avg_ms', stats)
+        self.assertIn('oldest_pending_s', stats)
+        self.assertFalse(stats['stalled'])
+
+    @override_settings(TASKS_STALLED_AFTER=60)
+    def test_stalled(self):
+        """Без воркера задача остаётся в очереди и помечается stalled."""
+        job = record.delay(1)
+        Job.objects.filter(pk=job.pk).update(
+            run_at=timezone.now() - timedelta(minutes=5)
+        )
+        self.assertIsNotNone(record.delay(2))
+        self.assertEqual(calls, [])
+        self.assertTrue(queue.stats()[record.name]['stalled'])
+
+    def test_password_reset_email(self):
+        """Письмо сброса пароля отправляется воркером, а не запросом."""
+        User.objects.create_user(
+            username='forgetful',
+            email='forgetful@example.com',
+            password='secret-password',
+        )
+        self.client.post(
+            reverse('users:password_reset'),
+            {'email': 'forgetful@example.com'},
+        )
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(self.run_ready(), [Job.DONE])
+        self.assertEqual(mail.outbox[0].to, ['forgetful@example.com'])
+
+
+class EagerTests(TestCase):
+    def test_eager_propagates(self):
+        """Без воркера задача выполняется сразу, а её ошибка не теряется."""
+        calls.clear()
+        self.assertIsNone(record.delay(1))
+        self.assertEqual(calls, [1])
+        with self.assertRaisesMessage(RuntimeError, 'сбой'):
+            broken.delay()
+        with override_settings(TASKS_EAGER_PROPAGATES=False):
+            with self.assertLogs('yatube.tasks', 'ERROR'):
+                broken.delay()
+
+
+@override_settings(TASKS_EAGER=False)
+class WorkerTests(TransactionTestCase):
+    def test_run_once(self):
+        """Воркер выполняет все готовые задачи и выходит."""
+        calls.clear()
+        for value in range(3):
+            record.delay(value)
+        metrics = queue.Worker(threads=1, poll=0.01).run(once=True)
+        self.assertEqual(metrics['done'], 3)
+        self.assertEqual(sorted(calls), [0, 1, 2])
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from ..sqlite_cache import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_shared_between_instances(self):
+        """Значения и счётчики видны всем процессам с тем же файлом."""
+        self.cache.set('page:1', {'a': 1}, None)
+        other = self.make_cache()
+        self.assertEqual(other.get('page:1'), {'a': 1})
+        other.set('generation:index', 1, None)
+        self.assertEqual(self.cache.incr('generation:index'), 2)
+        self.assertEqual(other.get('generation:index'), 2)
+        self.assertEqual(
+            other.get_many(['page:1', 'page:2']), {'page:1': {'a': 1}}
+        )
+        self.cache.delete('page:1')
+        self.assertIsNone(other.get('page:1'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_add_and_expiry(self):
+        """add не заменяет живую запись, истёкшие значения не видны."""
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+        self.cache.set('short', 1, 0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 2))
+        self.assertEqual(self.cache.get('short'), 2)
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читавшиеся записи."""
+        cache = self.make_cache(
+            MAX_ENTRIES=3, CULL_FREQUENCY=3, ACCESS_RESOLUTION=0
+        )
+        for number in range(3):
+            cache.set(f'post-card:{number}', number)
+        cache.get('post-card:0')
+        cache.set('post-card:3', 3)
+        self.assertEqual(
+            cache.get_many([f'post-card:{number}' for number in range(4)]),
+            {'post-card:0': 0, 'post-card:3': 3},
+        )
+        self.assertEqual(cache.totals()[0], 2)
+        stats = cache.stats()['post-card']
+        self.assertEqual(stats['evictions'], 2)
+        self.assertEqual(stats['sets'], 4)
+
+    def test_size_limit(self):
+        """Суммарный объём значений не превышает MAX_SIZE."""
+        cache = self.make_cache(MAX_SIZE=10000)
+        for number in range(10):
+            cache.set(f'page:{number}', 'x' * 2000)
+        self.assertLessEqual(cache.totals()[1], 10000)
+
+    def test_stats_by_prefix(self):
+        """Попадания и промахи считаются по префиксу ключа."""
+        self.cache.set('page:1', 1)
+        self.cache.get('page:1')
+        self.cache.get_many(['page:2', 'generation:index'])
+        stats = self.cache.stats()
+        self.assertEqual(stats['page']['hits'], 1)
+        self.assertEqual(stats['page']['misses'], 1)
+        self.assertEqual(stats['generation']['misses'], 1)
@@ -0,0 +1,91 @@
+import gzip
+import tempfile
+
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from .. import staticfiles
+from ..middleware import StaticFilesMiddleware
+
+
+class StaticFilesTests(SimpleTestCase):
+    def test_minify_css(self):
+        """Пробелы и комментарии уходят, строки остаются как есть."""
+        css = '/* c */ a:hover , b > i {\n  color: red;\n  content: "x,  y";}'
+        self.assertEqual(
+            staticfiles.minify_css(css),
+            'a:hover,b>i{color:red;content:"x,  y"}',
+        )
+
+    def test_prune_icons(self):
+        """В ionicons остаются только иконки из шаблонов."""
+        css = (
+            '@font-face{font-family:"Ionicons";src:url("f.eot");'
+            'src:url("f.eot#iefix") format("embedded-opentype"),'
+            'url("f.ttf") format("truetype"),url("f.woff") format("woff")}'
+            '.ion-alert:before,.ion-social-yahoo:before{display:inline-block}'
+            '.ion-alert:before{content:"\\f101"}'
+            '.ion-social-yahoo:before{content:"\\f24b"}'
+        )
+        self.assertEqual(
+            staticfiles.prune_icons(css, {'social-yahoo'}),
+            '@font-face{font-family:"Ionicons";src:url("f.woff") '
+            'format("woff"),url("f.ttf") format("truetype")}'
+            '.ion-social-yahoo:before{display:inline-block}'
+            '.ion-social-yahoo:before{content:"\\f24b"}',
+        )
+
+    def test_accepted_encodings(self):
+        """Кодировки с q=0 и похожие по имени токены не выбираются."""
+        cases = {
+            'gzip, deflate, br': ['br', 'gzip'],
+            'br;q=0, gzip;q=0.5': ['gzip'],
+            'br;q=0, gzip;q=0': [],
+            'x-gzip': [],
+            '*;q=0.1, br;q=0': ['gzip'],
+            '': [],
+        }
+        for header, encodings in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(
+                    staticfiles.accepted_encodings(header), encodings
+                )
+
+    def test_collect_and_serve(self):
+        """Бандл с хэшем отдаётся сжатым и кэшируется навсегда."""
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            STATIC_ROOT=root,
+            STATICFILES_STORAGE=(
+                'core.staticfiles.CompressedManifestStaticFilesStorage'
+            ),
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            name = staticfiles.CompressedManifestStaticFilesStorage(
+            ).stored_name('css/yatube.min.css')
+            middleware = StaticFilesMiddleware(lambda request: HttpResponse())
+            factory = RequestFactory()
+            response = middleware(factory.get(
+                f'/static/{name}', HTTP_ACCEPT_ENCODING='gzip, deflate'
+            ))
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertIn('immutable', response['Cache-Control'])
+            css = gzip.decompress(b''.join(response.streaming_content))
+            self.assertNotIn(b'ion-alert', css)
+            self.assertRegex(css, rb'fonts/ionicons\.\w{12}\.woff')
+            response.close()
+            response = middleware(factory.get(
+                f'/static/{name}', HTTP_ACCEPT_ENCODING='gzip;q=0'
+            ))
+            self.assertNotIn('Content-Encoding', response)
+            response.close()
+            response = middleware(factory.get('/static/css/yatube.min.css'))
+            self.assertNotIn('Content-Encoding', response)
+            self.assertNotIn('immutable', response['Cache-Control'])
+            response.close()
+            # Страницы ссылаются на бандл с хэшем из манифеста.
+            self.assertContains(
+                self.client.get(reverse('about:author')), f'/static/{name}'
+            )
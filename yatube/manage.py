@@ -4,7 +4,10 @@ import sys
 
 
 def main():
-    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+    settings = "yatube.settings"
+    if sys.argv[1:2] == ["test"]:
+        settings = "yatube.settings_test"
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
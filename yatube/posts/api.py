@@ -0,0 +1,177 @@
+"""JSON-API лент только для чтения.
+
+``api/posts/``, ``api/group/<slug>/`` и ``api/profile/<username>/``
+отдают те же ленты, что и HTML-страницы, но без шаблонов. Посты с
+автором и группой читаются одним запросом через ``values_list``, без
+создания моделей. Для выбранных полей заранее собирается список
+функций, а каждая строка кодируется в JSON одним вызовом. Ответ
+пишется потоком, по посту за раз, и сжимается gzip, если клиент его
+принимает. Строки страницы (не больше ``MAX_LIMIT``) читаются внутри
+представления, чтобы запрос шёл через маршрутизатор реплик и замеры.
+
+Параметры: ``fields`` — поля через запятую (по умолчанию все из
+``FIELDS``), ``limit`` — размер страницы, ``after`` — курсор из
+``next`` предыдущего ответа.
+"""
+import json
+
+from core.db_router import use_replica
+from core.paginator import CursorPaginator, decode_cursor, encode_cursor
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+
+from . import thumbnails
+from .models import Group, Post, User
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Колонки для курсора: читаются всегда, даже если их нет в fields.
+CURSOR_COLUMNS = ('pub_date', 'id')
+
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+def _author(username, first_name, last_name):
+    return {
+        'username': username,
+        'full_name': f'{first_name} {last_name}'.strip(),
+    }
+
+
+def _group(slug, title):
+    return {'slug': slug, 'title': title} if slug else None
+
+
+def _image(name):
+    return default_storage.url(name) if name else None
+
+
+# Поле ответа -> (колонки values_list, функция от их значений).
+FIELDS = {
+    'id': (('id',), None),
+    'text': (('text',), None),
+    'pub_date': (('pub_date',), lambda value: value.isoformat()),
+    'author': (
+        ('author__username', 'author__first_name', 'author__last_name'),
+        _author,
+    ),
+    'group': (('group__slug', 'group__title'), _group),
+    'image': (('image',), _image),
+    # Миниатюры страницы ищутся разом в Serializer.prepare.
+    'thumbnail': (('image',), None),
+    'comments_count': (('comments_count',), None),
+}
+
+
+class Serializer:
+    """Строка ``values_list`` -> JSON только с выбранными полями."""
+
+    def __init__(self, fields):
+        self.columns = list(CURSOR_COLUMNS)
+        self.fields = []
+        self.thumbnails = {}
+        for name in fields:
+            columns, convert = FIELDS[name]
+            if name == 'thumbnail':
+                convert = self._thumbnail
+            indexes = []
+            for column in columns:
+                if column not in self.columns:
+                    self.columns.append(column)
+                indexes.append(self.columns.index(column))
+            self.fields.append((name, indexes, convert))
+
+    def prepare(self, rows):
+        """Готовые миниатюры всей страницы одним запросом."""
+        if 'thumbnail' in (name for name, _, _ in self.fields):
+            index = self.columns.index('image')
+            self.thumbnails = thumbnails.ready_many(
+                (row[index] for row in rows),
+                next(iter(settings.POST_THUMBNAILS)),
+            )
+
+    def _thumbnail(self, name):
+        thumbnail = self.thumbnails.get(name)
+        return thumbnail and thumbnail.url
+
+    def encode(self, row):
+        return _encode({
+            name: (
+                convert(*[row[index] for index in indexes]) if convert
+                else row[indexes[0]]
+            )
+            for name, indexes, convert in self.fields
+        })
+
+    def cursor(self, row):
+        return encode_cursor(row[0], row[1])
+
+
+def _error(message):
+    return JsonResponse({'error': message}, status=400)
+
+
+def _stream(serializer, rows, next_cursor):
+    yield '{"results":['
+    for number, row in enumerate(rows):
+        yield (',' if number else '') + serializer.encode(row)
+    yield '],"next":' + _encode(next_cursor) + '}'
+
+
+def feed_response(request, queryset):
+    fields = request.GET.get('fields')
+    fields = fields.split(',') if fields else list(FIELDS)
+    unknown = set(fields) - FIELDS.keys()
+    if unknown:
+        return _error(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return _error('limit должен быть числом')
+    if not 1 <= limit <= MAX_LIMIT:
+        return _error(f'limit должен быть от 1 до {MAX_LIMIT}')
+    paginator = CursorPaginator(queryset, limit)
+    rows = paginator.object_list
+    if 'after' in request.GET:
+        position = decode_cursor(request.GET['after'])
+        if position is None:
+            return _error('Неверный курсор')
+        rows = paginator.older_than(position)
+    serializer = Serializer(fields)
+    rows = list(rows.values_list(*serializer.columns)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = serializer.cursor(rows[-1])
+    serializer.prepare(rows)
+    return StreamingHttpResponse(
+        _stream(serializer, rows, next_cursor),
+        content_type='application/json',
+    )
+
+
+@use_replica
+@gzip_page
+@require_GET
+def index(request):
+    return feed_response(request, Post.objects.all())
+
+
+@use_replica
+@gzip_page
+@require_GET
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return feed_response(request, Post.objects.filter(group=group))
+
+
+@use_replica
+@gzip_page
+@require_GET
+def profile(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return feed_response(request, Post.objects.filter(author=author))
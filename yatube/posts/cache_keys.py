@@ -0,0 +1,6 @@
+"""Ключи кэша постов, общие для представлений, шаблонов и сигналов."""
+
+# Автор поста не меняется, ключ хранится без таймаута.
+POST_AUTHOR_KEY = 'post-author:{}'
+# Версия — отпечаток данных карточки, см. ``post_cards.card_version``.
+CARD_KEY = 'post-card:{pk}:{version}'
@@ -0,0 +1,103 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарным ``UPDATE ... SET n = n + 1`` в той же
+транзакции, что и сами данные. Команда ``reconcile_counters`` пересчитывает
+их по таблицам, если они разошлись.
+"""
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    """Меняет счётчик пользователя, создавая строку при её отсутствии."""
+    stats = UserStats.objects.filter(user_id=user_id)
+    if not _change(stats, field, delta) and delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        reconcile_users(stats)
+
+
+def change_users(user_ids, field, delta):
+    """То же для многих пользователей одним ``UPDATE``."""
+    stats = UserStats.objects.filter(user_id__in=user_ids)
+    if _change(stats, field, delta) < len(user_ids) and delta > 0:
+        UserStats.objects.bulk_create(
+            (UserStats(user_id=user_id) for user_id in user_ids),
+            ignore_conflicts=True,
+        )
+        reconcile_users(stats)
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        _change(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def change_post(post_id, delta):
+    _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0,
+    )
+
+
+def _reconcile(queryset, **counts):
+    """Исправляет счётчики, возвращает число исправленных строк."""
+    actual = {f'actual_{field}': count for field, count in counts.items()}
+    drift = Q()
+    for field in counts:
+        drift |= ~Q(**{field: F(f'actual_{field}')})
+    drifted = list(
+        queryset.annotate(**actual).filter(drift).values_list('pk', flat=True)
+    )
+    if drifted:
+        queryset.filter(pk__in=drifted).update(**counts)
+    return len(drifted)
+
+
+def reconcile_users(queryset=None):
+    if queryset is None:
+        UserStats.objects.bulk_create(
+            UserStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        )
+        queryset = UserStats.objects.all()
+    # Первичный ключ UserStats совпадает с id пользователя.
+    return _reconcile(
+        queryset,
+        posts_count=_count(Post, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    )
+
+
+def reconcile_groups(queryset=None):
+    return _reconcile(
+        Group.objects.all() if queryset is None else queryset,
+        posts_count=_count(Post, 'group'),
+    )
+
+
+def reconcile_posts(queryset=None):
+    return _reconcile(
+        Post.objects.all() if queryset is None else queryset,
+        comments_count=_count(Comment, 'post'),
+    )
@@ -0,0 +1,115 @@
+"""Идемпотентные подписка и отписка.
+
+Пара (пользователь, автор) уникальна в базе, поэтому подписка — один
+``INSERT ... ON CONFLICT DO NOTHING`` (на SQLite ``INSERT OR IGNORE``),
+а отписка — один ``DELETE``: повторный запрос и гонка двух запросов
+ничего не ломают. Обе функции принимают сразу много авторов, например
+импортированный список контактов.
+
+Сигналы моделей здесь не срабатывают, поэтому счётчики, ленты подписок
+и кэш страниц обновляются явно. Если изменились все пары, счётчики
+сдвигаются на известную величину, иначе неизвестно, какие пары уже
+были, и счётчики затронутых пользователей пересчитываются.
+"""
+from core.cache import bump
+from django.db import connection, transaction
+
+from . import counters, timeline
+from .models import Follow, UserStats
+
+BATCH_SIZE = 500
+
+
+def _column(field):
+    return connection.ops.quote_name(Follow._meta.get_field(field).column)
+
+
+def _others(user, authors):
+    """Авторы без повторов и без самого пользователя."""
+    unique = {author.pk: author for author in authors}
+    unique.pop(user.pk, None)
+    return list(unique.values())
+
+
+def _execute(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def _batches(authors):
+    for start in range(0, len(authors), BATCH_SIZE):
+        yield [author.pk for author in authors[start:start + BATCH_SIZE]]
+
+
+def _insert(user_id, author_ids):
+    ops = connection.ops
+    sql = '{insert} {table} ({user}, {author}) VALUES {rows} {suffix}'.format(
+        insert=ops.insert_statement(ignore_conflicts=True),
+        table=ops.quote_name(Follow._meta.db_table),
+        user=_column('user'),
+        author=_column('author'),
+        rows=', '.join(['(%s, %s)'] * len(author_ids)),
+        suffix=ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    )
+    return _execute(
+        sql, [value for pk in author_ids for value in (user_id, pk)]
+    )
+
+
+def _delete(user_id, author_ids):
+    sql = 'DELETE FROM {table} WHERE {user} = %s AND {author} IN ({ids})'
+    return _execute(
+        sql.format(
+            table=connection.ops.quote_name(Follow._meta.db_table),
+            user=_column('user'),
+            author=_column('author'),
+            ids=', '.join(['%s'] * len(author_ids)),
+        ),
+        [user_id, *author_ids],
+    )
+
+
+def _changed(user, authors, changed, delta):
+    author_ids = [author.pk for author in authors]
+    if changed == len(authors):
+        counters.change_user(user.pk, 'following_count', delta * changed)
+        counters.change_users(author_ids, 'followers_count', delta)
+    else:
+        counters.reconcile_users(
+            UserStats.objects.filter(user__in=[user.pk, *author_ids])
+        )
+    bump(
+        f'profile:{user.username}',
+        *(f'profile:{author.username}' for author in authors),
+    )
+
+
+def follow(user, authors):
+    """Подписывает ``user`` на ``authors``; возвращает число новых подписок."""
+    authors = _others(user, authors)
+    with transaction.atomic():
+        created = sum(
+            _insert(user.pk, batch) for batch in _batches(authors)
+        )
+        if created:
+            _changed(user, authors, created, 1)
+            if timeline.is_enabled():
+                timeline.backfill.delay(
+                    user.pk, [author.pk for author in authors]
+                )
+    return created
+
+
+def unfollow(user, authors):
+    """Отписывает ``user`` от ``authors``; возвращает число удалённых."""
+    authors = _others(user, authors)
+    with transaction.atomic():
+        deleted = sum(
+            _delete(user.pk, batch) for batch in _batches(authors)
+        )
+        if deleted:
+            _changed(user, authors, deleted, -1)
+            if timeline.is_enabled():
+                timeline.purge(user.pk, [author.pk for author in authors])
+    return deleted
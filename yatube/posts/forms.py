@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Comment, Post
 
 
@@ -20,6 +22,15 @@ class PostForm(forms.ModelForm):
             ),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        processed = images.normalize(image)
+        self.instance.image_width = processed.width
+        self.instance.image_height = processed.height
+        return processed
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,80 @@
+"""Обработка загруженных картинок постов.
+
+Загрузка проверяется на размер файла и число пикселей, поворачивается по
+EXIF, уменьшается до ``POST_IMAGE_MAX_SIDE`` и пересохраняется в JPEG
+(или WebP при ``POST_IMAGE_WEBP``) без метаданных. Размеры результата
+записываются в пост, чтобы шаблонам не открывать файл. Миниатюры из
+``POST_THUMBNAILS`` строятся потом в фоне уже из этой копии.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, features
+
+BACKGROUND = (255, 255, 255)
+
+
+class ProcessedImage(ContentFile):
+    def __init__(self, content, name, width, height):
+        super().__init__(content, name=name)
+        self.width = width
+        self.height = height
+
+
+def output_format():
+    if settings.POST_IMAGE_WEBP and features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def validate_size(upload):
+    limit = settings.POST_IMAGE_MAX_UPLOAD_SIZE
+    if upload.size > limit:
+        raise ValidationError(
+            f'Файл больше {filesizeformat(limit)}.', code='file_too_large'
+        )
+
+
+def _flatten(image):
+    """RGB без прозрачности: прозрачные места заливаются белым."""
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, BACKGROUND)
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def normalize(upload):
+    """Уменьшенная копия загрузки без метаданных."""
+    validate_size(upload)
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    upload.seek(0)
+    with Image.open(upload) as source:
+        if source.width * source.height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                'Слишком большое разрешение картинки.', code='too_many_pixels'
+            )
+        # JPEG декодируется сразу в уменьшенном масштабе.
+        source.draft('RGB', (max_side, max_side))
+        icc_profile = source.info.get('icc_profile')
+        image = _flatten(ImageOps.exif_transpose(source))
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    image_format, extension = output_format()
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        image_format,
+        quality=settings.POST_IMAGE_QUALITY,
+        optimize=True,
+        progressive=True,
+        icc_profile=icc_profile,
+    )
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    return ProcessedImage(
+        buffer.getvalue(), f'{stem}.{extension}', *image.size
+    )
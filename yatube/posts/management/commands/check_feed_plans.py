@@ -0,0 +1,51 @@
+import re
+
+from core.paginator import CursorPaginator
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from posts import timeline
+from posts.models import Comment, Follow, Post, User
+from posts.views import LIMIT
+
+FULL_SCAN = re.compile(
+    r'\bSCAN (TABLE )?\w+(?! USING)( |$)'
+    r'|USE TEMP B-TREE FOR ORDER BY'
+    r'|Seq Scan on',
+    re.MULTILINE,
+)
+
+
+def feed_queries():
+    """Запросы лент в том виде, в каком их выполняют представления."""
+    user = User(pk=1)
+    position = (timezone.now(), 1)
+    feeds = {
+        'index': (Post.objects.feed(), 'pub_date'),
+        'group_posts': (Post.objects.feed().filter(group=1), 'pub_date'),
+        'profile': (Post.objects.feed().filter(author=user), 'pub_date'),
+        'follow_index': (timeline.feed(user), 'feed_date'),
+    }
+    for name, (queryset, key) in feeds.items():
+        paginator = CursorPaginator(queryset, LIMIT, key=key)
+        yield name, paginator.object_list[:LIMIT + 1]
+        yield f'{name} (after)', paginator.older_than(position)[:LIMIT + 1]
+        yield f'{name} (before)', paginator.newer_than(position)[:LIMIT + 1]
+    yield 'post_detail comments', Comment.objects.filter(post=1)
+    yield 'profile following', Follow.objects.filter(user=user, author=2)
+
+
+class Command(BaseCommand):
+    help = 'Проверяет EXPLAIN запросов лент на полный просмотр таблиц.'
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, query in feed_queries():
+            plan = query.explain()
+            self.stdout.write(f'{name}:\n{plan}\n')
+            if FULL_SCAN.search(plan):
+                failed.append(name)
+        if failed:
+            raise CommandError(
+                'Полный просмотр таблицы: {}'.format(', '.join(failed))
+            )
+        self.stdout.write(self.style.SUCCESS('Все ленты используют индексы.'))
@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты, комментарии или подписки в JSONL или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(transfer.FIELDS))
+        parser.add_argument('path', help='Файл или "-" для stdout.')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default='jsonl'
+        )
+
+    def handle(self, *args, **options):
+        log = self.stderr.write
+        if options['path'] == '-':
+            transfer.export(
+                options['kind'], sys.stdout, options['format'], log=log
+            )
+            return
+        with open(
+            options['path'], 'w', encoding='utf-8', newline=''
+        ) as file:
+            transfer.export(options['kind'], file, options['format'], log=log)
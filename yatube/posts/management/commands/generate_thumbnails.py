@@ -0,0 +1,41 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from posts import thumbnails
+
+UPLOAD_DIR = 'posts'
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для уже загруженных картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число параллельных потоков.',
+        )
+
+    def handle(self, *args, **options):
+        root = os.path.join(settings.MEDIA_ROOT, UPLOAD_DIR)
+        names = [
+            os.path.join(UPLOAD_DIR, filename)
+            for filename in sorted(os.listdir(root))
+            if os.path.isfile(os.path.join(root, filename))
+        ] if os.path.isdir(root) else []
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {
+                executor.submit(thumbnails.generate, name): name
+                for name in names
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{futures[future]}: {error}')
+        self.stdout.write(
+            f'Обработано картинок: {len(names) - failed}, ошибок: {failed}'
+        )
@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Загружает посты, комментарии или подписки из JSONL или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(transfer.FIELDS))
+        parser.add_argument('path', help='Файл или "-" для stdin.')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default='jsonl'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Пересчитать счётчики, ленты, поиск и рейтинги целиком.',
+        )
+
+    def handle(self, *args, **options):
+        kwargs = {
+            'fmt': options['format'],
+            'batch_size': options['batch_size'],
+            'rebuild': options['rebuild'],
+            'log': self.stderr.write,
+        }
+        if options['path'] == '-':
+            loaded, skipped = transfer.load(
+                options['kind'], sys.stdin, **kwargs
+            )
+        else:
+            with open(
+                options['path'], encoding='utf-8', newline=''
+            ) as file:
+                loaded, skipped = transfer.load(
+                    options['kind'], file, **kwargs
+                )
+        self.stdout.write(f'Загружено: {loaded}, пропущено: {skipped}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand, CommandError
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Строит поисковый индекс постов заново.'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Поисковый индекс есть только в SQLite.')
+        self.stdout.write(f'Проиндексировано постов: {search.rebuild()}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинги ленты популярного (запускать по cron).'
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'Постов в ленте популярного: {trending.recompute()}'
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики по данным.'
+
+    def handle(self, *args, **options):
+        for name, reconcile in (
+            ('пользователей', counters.reconcile_users),
+            ('групп', counters.reconcile_groups),
+            ('постов', counters.reconcile_posts),
+        ):
+            self.stdout.write(f'Исправлено счётчиков {name}: {reconcile()}')
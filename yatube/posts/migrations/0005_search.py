@@ -0,0 +1,104 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:10
+
+import re
+
+from django.db import migrations
+
+# Копия стеммера из posts/search.py на момент миграции: миграция не
+# должна зависеть от будущих правок модуля.
+_WORD = re.compile(r'\w+')
+_VOWEL = '[аеиоуыэюя]'
+_RV = re.compile(_VOWEL)
+_REGION = re.compile(f'{_VOWEL}[^аеиоуыэюя]')
+_GERUND = re.compile(
+    r'(?:(?<=[ая])(?:вшись|вши|в)|ившись|ывшись|ивши|ывши|ив|ыв)$'
+)
+_REFLEXIVE = re.compile(r'(?:ся|сь)$')
+_ADJECTIVE = (
+    r'(?:ими|ыми|его|ого|ему|ому|ее|ие|ые|ое|ей|ий|ый|ой|ем|им|ым|ом'
+    r'|их|ых|ую|юю|ая|яя|ою|ею)'
+)
+_PARTICIPLE = r'(?:(?<=[ая])(?:ем|нн|вш|ющ|щ)|ивш|ывш|ующ)'
+_ADJECTIVAL = re.compile(f'{_PARTICIPLE}?{_ADJECTIVE}$')
+_VERB = re.compile(
+    r'(?:(?<=[ая])(?:ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)'
+    r'|ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло'
+    r'|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)$'
+)
+_NOUN = re.compile(
+    r'(?:иями|ями|ами|иях|иям|ием|ией|ях|ям|ем|ам|ом|ах|ев|ов|ие|ье|еи'
+    r'|ии|ей|ой|ий|ию|ью|ия|ья|а|е|и|й|о|у|ы|ь|ю|я)$'
+)
+_DERIVATIONAL = re.compile(r'ость?$')
+_SUPERLATIVE = re.compile(r'ейше?$')
+
+
+def _region(word, start=0):
+    match = _REGION.search(word, start)
+    return match.end() if match else len(word)
+
+
+def stem(word):
+    """Основа русского слова; слова на других языках не меняются."""
+    word = word.lower().replace('ё', 'е')
+    match = _RV.search(word)
+    if match is None:
+        return word
+    start = match.end()
+    rv = word[start:]
+    rv, found = _GERUND.subn('', rv)
+    if not found:
+        rv = _REFLEXIVE.sub('', rv)
+        for pattern in (_ADJECTIVAL, _VERB, _NOUN):
+            rv, found = pattern.subn('', rv)
+            if found:
+                break
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    derivational = _DERIVATIONAL.search(rv)
+    if derivational and start + derivational.start() >= _region(
+        word, _region(word)
+    ):
+        rv = rv[:derivational.start()]
+    rv, found = _SUPERLATIVE.subn('', rv)
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    elif not found and rv.endswith('ь'):
+        rv = rv[:-1]
+    return word[:start] + rv
+
+
+def terms(text):
+    return [stem(word) for word in _WORD.findall(text)]
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_search USING fts5(body)'
+    )
+    Post = apps.get_model('posts', 'Post')
+    schema_editor.connection.cursor().executemany(
+        'INSERT INTO posts_search (rowid, body) VALUES (%s, %s)',
+        [
+            (post_id, ' '.join(terms(text)))
+            for post_id, text in Post.objects.values_list('pk', 'text')
+        ],
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
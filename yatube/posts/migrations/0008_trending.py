@@ -0,0 +1,88 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:47
+
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+from django.utils import timezone
+import django.db.models.deletion
+
+# Копия расчёта рейтинга из posts/trending.py на момент миграции:
+# миграция не должна зависеть от будущих правок модуля и настроек.
+BATCH_SIZE = 500
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def event(weight, when):
+    tau = setting('TRENDING_HALF_LIFE', 12 * 60 * 60) / math.log(2)
+    return math.log(weight) + when.timestamp() / tau
+
+
+def log_add(a, b):
+    return max(a, b) + math.log1p(math.exp(-abs(a - b)))
+
+
+def fill_trending(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Trending = apps.get_model('posts', 'Trending')
+    since = timezone.now() - timedelta(
+        seconds=setting('TRENDING_WINDOW', 7 * 24 * 60 * 60)
+    )
+    follower_weight = setting('TRENDING_FOLLOWER_WEIGHT', 1.0)
+    comment_weight = setting('TRENDING_COMMENT_WEIGHT', 1.0)
+    recent = Comment.objects.filter(created__gte=since).order_by()
+    scores = {
+        pk: event(1 + follower_weight * math.log1p(followers or 0), pub_date)
+        for pk, pub_date, followers in Post.objects.filter(
+            Q(pub_date__gte=since) | Q(pk__in=recent.values('post'))
+        ).order_by().values_list(
+            'pk', 'pub_date', 'author__stats__followers_count'
+        ).iterator()
+    }
+    for post_id, created in recent.values_list(
+        'post', 'created'
+    ).iterator():
+        if post_id in scores:
+            scores[post_id] = log_add(
+                scores[post_id], event(comment_weight, created)
+            )
+    Trending.objects.bulk_create(
+        (
+            Trending(post_id=post_id, score=score)
+            for post_id, score in scores.items()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trending',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('score', models.FloatField(verbose_name='Рейтинг')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг поста',
+                'verbose_name_plural': 'Популярные посты',
+                'ordering': ('-score',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trending',
+            index=models.Index(fields=['-score', '-post'], name='trending_score_idx'),
+        ),
+        migrations.RunPython(fill_trending, migrations.RunPython.noop),
+    ]
@@ -14,6 +14,9 @@ class Group(models.Model):
     description = models.TextField(
         verbose_name='Описание',
     )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число постов', default=0, editable=False
+    )
 
     def __str__(self):
         return self.title
@@ -24,6 +27,21 @@ class Group(models.Model):
         verbose_name_plural = 'Группы'
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Посты для карточек ленты: автор и группа одним JOIN."""
+        return self.select_related('author', 'group').only(
+            'text',
+            'pub_date',
+            'image',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group__slug',
+            'group__title',
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст'
@@ -49,12 +67,36 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True,
     )
+    image_width = models.PositiveIntegerField(
+        verbose_name='Ширина картинки', null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        verbose_name='Высота картинки', null=True, blank=True, editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Число комментариев', default=0, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'), name='post_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_date_idx',
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_date_idx',
+            ),
+        )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -78,7 +120,12 @@ class Comment(models.Model):
     )
 
     class Meta:
-        ordering = ('post',)
+        ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('post', 'created'), name='comment_post_created_idx'
+            ),
+        )
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -99,5 +146,89 @@ class Follow(models.Model):
 
     class Meta:
         ordering = ('user',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='follow_unique_user_author'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='follow_not_self',
+            ),
+        )
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляемые вместе с данными."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число постов', default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Число подписок', default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(verbose_name='Публикация')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        unique_together = ('user', 'post')
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_feed_idx',
+            ),
+        )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+
+class Trending(models.Model):
+    """Рейтинг поста в ленте популярного (см. ``posts.trending``)."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Пост',
+    )
+    score = models.FloatField(verbose_name='Рейтинг')
+
+    class Meta:
+        ordering = ('-score',)
+        indexes = (
+            models.Index(
+                fields=('-score', '-post'), name='trending_score_idx'
+            ),
+        )
+        verbose_name = 'Рейтинг поста'
+        verbose_name_plural = 'Популярные посты'
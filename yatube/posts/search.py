@@ -0,0 +1,224 @@
+"""Полнотекстовый поиск по постам.
+
+Текст поста разбивается на слова, слова приводятся к основе упрощённым
+стеммером Snowball для русского языка и хранятся в таблице SQLite FTS5
+``posts_search`` с ``rowid`` поста. Запрос проходит ту же обработку,
+результаты упорядочены по BM25. Индекс обновляется сигналами сохранения
+и удаления поста, ``rebuild_search_index`` строит его заново, а
+``index_missing`` пачками добавляет посты после загрузки. На других
+СУБД поиск сводится к ``icontains``. Пустой запрос на любой СУБД
+ничего не находит.
+"""
+import re
+
+from django.db import connection, transaction
+
+from .models import Post
+
+TABLE = 'posts_search'
+BATCH_SIZE = 1000
+
+_WORD = re.compile(r'\w+')
+_VOWEL = '[аеиоуыэюя]'
+_RV = re.compile(_VOWEL)
+_REGION = re.compile(f'{_VOWEL}[^аеиоуыэюя]')
+_GERUND = re.compile(
+    r'(?:(?<=[ая])(?:вшись|вши|в)|ившись|ывшись|ивши|ывши|ив|ыв)$'
+)
+_REFLEXIVE = re.compile(r'(?:ся|сь)$')
+_ADJECTIVE = (
+    r'(?:ими|ыми|его|ого|ему|ому|ее|ие|ые|ое|ей|ий|ый|ой|ем|им|ым|ом'
+    r'|их|ых|ую|юю|ая|яя|ою|ею)'
+)
+_PARTICIPLE = r'(?:(?<=[ая])(?:ем|нн|вш|ющ|щ)|ивш|ывш|ующ)'
+_ADJECTIVAL = re.compile(f'{_PARTICIPLE}?{_ADJECTIVE}$')
+_VERB = re.compile(
+    r'(?:(?<=[ая])(?:ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)'
+    r'|ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло'
+    r'|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)$'
+)
+_NOUN = re.compile(
+    r'(?:иями|ями|ами|иях|иям|ием|ией|ях|ям|ем|ам|ом|ах|ев|ов|ие|ье|еи'
+    r'|ии|ей|ой|ий|ию|ью|ия|ья|а|е|и|й|о|у|ы|ь|ю|я)$'
+)
+_DERIVATIONAL = re.compile(r'ость?$')
+_SUPERLATIVE = re.compile(r'ейше?$')
+
+
+def _region(word, start=0):
+    match = _REGION.search(word, start)
+    return match.end() if match else len(word)
+
+
+def stem(word):
+    """Основа русского слова; слова на других языках не меняются."""
+    word = word.lower().replace('ё', 'е')
+    match = _RV.search(word)
+    if match is None:
+        return word
+    start = match.end()
+    rv = word[start:]
+    rv, found = _GERUND.subn('', rv)
+    if not found:
+        rv = _REFLEXIVE.sub('', rv)
+        for pattern in (_ADJECTIVAL, _VERB, _NOUN):
+            rv, found = pattern.subn('', rv)
+            if found:
+                break
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    derivational = _DERIVATIONAL.search(rv)
+    if derivational and start + derivational.start() >= _region(
+        word, _region(word)
+    ):
+        rv = rv[:derivational.start()]
+    rv, found = _SUPERLATIVE.subn('', rv)
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    elif not found and rv.endswith('ь'):
+        rv = rv[:-1]
+    return word[:start] + rv
+
+
+def terms(text):
+    return [stem(word) for word in _WORD.findall(text)]
+
+
+def match_expression(query):
+    """Запрос FTS5: все слова запроса как префиксы основ."""
+    return ' '.join(f'"{term}"*' for term in terms(query))
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def index_post(post):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)',
+            [post.pk, ' '.join(terms(post.text))],
+        )
+
+
+def remove_post(post_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def _pk_column():
+    quote = connection.ops.quote_name
+    return f'{quote(Post._meta.db_table)}.{quote(Post._meta.pk.column)}'
+
+
+def _insert(cursor, rows):
+    """Индексирует пары (id, текст) пачками по ``BATCH_SIZE``."""
+    count = 0
+    batch = []
+    for post_id, text in rows:
+        batch.append((post_id, ' '.join(terms(text))))
+        if len(batch) == BATCH_SIZE:
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)', batch
+            )
+            count += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)', batch
+        )
+        count += len(batch)
+    return count
+
+
+@transaction.atomic
+def rebuild():
+    """Строит индекс заново, возвращает число постов в нём."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        return _insert(
+            cursor, Post.objects.values_list('pk', 'text').iterator()
+        )
+
+
+@transaction.atomic
+def index_missing(queryset):
+    """Добавляет в индекс посты из ``queryset``, которых в нём нет.
+
+    Уже проиндексированные посты не читаются, поэтому после загрузки
+    работа пропорциональна числу новых постов. Возвращает их число.
+    """
+    if not is_available():
+        return 0
+    missing = queryset.extra(
+        where=[f'{_pk_column()} NOT IN (SELECT rowid FROM {TABLE})']
+    )
+    with connection.cursor() as cursor:
+        return _insert(
+            cursor, missing.values_list('pk', 'text').iterator()
+        )
+
+
+def filter_posts(queryset, query):
+    """Посты из ``queryset``, подходящие под запрос, без ранжирования."""
+    if not query.strip():
+        return queryset.none()
+    if not is_available():
+        return queryset.filter(text__icontains=query)
+    match = match_expression(query)
+    if not match:
+        return queryset.none()
+    return queryset.extra(
+        where=[
+            f'{_pk_column()} IN '
+            f'(SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s)'
+        ],
+        params=[match],
+    )
+
+
+class SearchResults:
+    """Ранжированная выдача для ``Paginator``: считает и режет в SQL."""
+
+    def __init__(self, query):
+        self.match = match_expression(query)
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {TABLE} WHERE {TABLE} MATCH %s',
+                [self.match],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not self.match:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+                'ORDER BY rank, rowid DESC LIMIT %s OFFSET %s',
+                [self.match, index.stop - index.start, index.start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search(query):
+    """Посты по запросу, лучшие совпадения первыми."""
+    if not query.strip():
+        return Post.objects.none()
+    if not is_available():
+        return Post.objects.feed().filter(text__icontains=query)
+    return SearchResults(query)
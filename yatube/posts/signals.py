@@ -0,0 +1,235 @@
+from core.cache import bump
+from django.core.cache import cache
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import counters, search, timeline, trending
+from .cache_keys import POST_AUTHOR_KEY
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# Поля, которые видны на страницах постов, лент и профилей.
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_PAGE_FIELDS = ('title', 'slug')
+
+
+@receiver(post_save, sender=Post)
+def push_to_timeline(sender, instance, created, **kwargs):
+    if created and timeline.is_enabled():
+        timeline.push_post.delay(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created and timeline.is_enabled():
+        timeline.backfill.delay(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def purge_timeline(sender, instance, **kwargs):
+    if timeline.is_enabled():
+        timeline.purge(instance.user_id, [instance.author_id])
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_group(sender, instance, **kwargs):
+    instance._old_group = (None, None)
+    if instance.pk is not None:
+        instance._old_group = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group', 'group__slug').first() or (None, None)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    scopes = {
+        'index',
+        f'post:{instance.pk}',
+        f'profile:{instance.author.username}',
+    }
+    if instance.group_id is not None:
+        scopes.add(f'group:{instance.group.slug}')
+    old_group_slug = getattr(instance, '_old_group', (None, None))[1]
+    if old_group_slug is not None:
+        scopes.add(f'group:{old_group_slug}')
+    bump(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    bump(
+        f'profile:{instance.user.username}',
+        f'profile:{instance.author.username}',
+    )
+
+
+def _remember(instance, fields, update_fields):
+    """Значения ``fields`` в базе до сохранения или None."""
+    if instance.pk is None or (
+        update_fields and not set(fields) & set(update_fields)
+    ):
+        return None
+    return type(instance).objects.filter(
+        pk=instance.pk
+    ).values_list(*fields).first()
+
+
+def _group_scopes(group):
+    """Области страниц, на которых видны группа и ссылки на неё."""
+    posts = Post.objects.filter(group=group)
+    return {
+        'index',
+        f'group:{group.slug}',
+        *(
+            f'profile:{username}'
+            for username in posts.values_list(
+                'author__username', flat=True
+            ).order_by().distinct()
+        ),
+        *(f'post:{pk}' for pk in posts.values_list('pk', flat=True)),
+    }
+
+
+@receiver(pre_save, sender=Group)
+def remember_old_group_page(sender, instance, update_fields, **kwargs):
+    instance._old_page = _remember(
+        instance, GROUP_PAGE_FIELDS, update_fields
+    )
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_pages(sender, instance, created, **kwargs):
+    old = getattr(instance, '_old_page', None)
+    if created or old is None or old == (instance.title, instance.slug):
+        bump(f'group:{instance.slug}')
+        return
+    # Название группы есть на странице каждого её поста, а адрес — в
+    # карточках на главной и в профилях.
+    bump(f'group:{old[1]}', *_group_scopes(instance))
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_pages(sender, instance, **kwargs):
+    # После удаления у постов уже не будет группы: SET_NULL не вызывает
+    # сигналы постов, поэтому области собираются заранее.
+    instance._scopes = _group_scopes(instance)
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_deleted_group_pages(sender, instance, **kwargs):
+    bump(*getattr(instance, '_scopes', {f'group:{instance.slug}'}))
+
+
+@receiver(pre_save, sender=User)
+def remember_old_name(sender, instance, update_fields, **kwargs):
+    # Вход в систему сохраняет только last_login и сюда не доходит.
+    instance._old_name = _remember(instance, USER_NAME_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_pages(sender, instance, created, **kwargs):
+    old = getattr(instance, '_old_name', None)
+    name = tuple(getattr(instance, field) for field in USER_NAME_FIELDS)
+    if created or old is None or old == name:
+        return
+    posts = Post.objects.filter(author=instance)
+    # Страница поста ищет область профиля по имени автора из кэша.
+    cache.delete_many([
+        POST_AUTHOR_KEY.format(pk) for pk in posts.values_list('pk', flat=True)
+    ])
+    bump(
+        'index',
+        f'profile:{old[0]}',
+        f'profile:{instance.username}',
+        *(
+            f'group:{slug}'
+            for slug in posts.exclude(group=None).values_list(
+                'group__slug', flat=True
+            ).order_by().distinct()
+        ),
+        # Имя автора видно и в комментариях к чужим постам.
+        *(
+            f'post:{pk}'
+            for pk in Comment.objects.filter(author=instance).values_list(
+                'post', flat=True
+            ).order_by().distinct()
+        ),
+    )
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        counters.change_group(instance.group_id, 1)
+        return
+    old_group_id = instance._old_group[0]
+    if old_group_id != instance.group_id:
+        counters.change_group(old_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    counters.change_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.user_id, 'following_count', 1)
+        counters.change_user(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change_user(instance.user_id, 'following_count', -1)
+    counters.change_user(instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def rank_post(sender, instance, created, **kwargs):
+    if created:
+        trending.add_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def rank_comment(sender, instance, created, **kwargs):
+    if created:
+        trending.add_comment(instance)
@@ -0,0 +1,61 @@
+import hashlib
+
+from core import instrumentation
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+from posts.cache_keys import CARD_KEY
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_list.html'
+
+
+def card_version(post):
+    """Отпечаток всех данных карточки: поста, автора и группы.
+
+    Любая правка меняет ключ, поэтому карточки не нужно сбрасывать.
+    """
+    group = post.group
+    parts = [
+        post.text,
+        post.pub_date.isoformat(),
+        post.image.name or '',
+        post.author.username,
+        post.author.get_full_name(),
+        group.slug if group else '',
+    ]
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def card_key(post):
+    return CARD_KEY.format(pk=post.pk, version=card_version(post))
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """HTML карточек постов одним запросом к кэшу.
+
+    Недостающие карточки отрисовываются и кэшируются, кроме карточек
+    с заглушкой вместо миниатюры.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    found = cache.get_many(keys)
+    card = context.template.engine.get_template(CARD_TEMPLATE)
+    rendered = {}
+    cards = []
+    for post, key in zip(posts, keys):
+        instrumentation.record_cache('post_card', key in found)
+        if key not in found:
+            card_context = context.new({
+                'post': post, 'request': context.get('request'),
+            })
+            found[key] = card.render(card_context)
+            if not card_context.get('thumbnail_pending'):
+                rendered[key] = found[key]
+        cards.append(mark_safe(found[key]))
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    return cards
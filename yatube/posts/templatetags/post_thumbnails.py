@@ -0,0 +1,18 @@
+from core.cache import skip_page_cache
+from django import template
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def ready_thumbnail(context, image, geometry):
+    """Готовая миниатюра или None, пока она создаётся в фоне."""
+    if not image:
+        return None
+    thumbnail = thumbnails.ready(image, geometry)
+    if thumbnail is None:
+        context['thumbnail_pending'] = True
+        if context.get('request') is not None:
+            skip_page_cache(context['request'])
+    return thumbnail
@@ -0,0 +1,142 @@
+import gzip
+import json
+import tempfile
+from http import HTTPStatus
+
+from core.models import Job
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import thumbnails
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+def read(response):
+    content = b''.join(response.streaming_content)
+    if response.get('Content-Encoding') == 'gzip':
+        content = gzip.decompress(content)
+    return json.loads(content)
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Классика', slug='classic', description='Описание'
+        )
+        for number in range(5):
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+                text=f'Пост {number}',
+            )
+
+    def test_feeds(self):
+        """Ленты отдают посты с автором и группой одним запросом."""
+        addresses = {
+            reverse('posts:api_index'): Post.objects.count(),
+            reverse('posts:api_group_list', kwargs={'slug': 'classic'}): 2,
+            reverse('posts:api_profile', kwargs={'username': 'writer'}): 5,
+        }
+        for address, count in addresses.items():
+            with self.subTest(address=address):
+                response = self.client.get(address, {'limit': 100})
+                self.assertEqual(response['Content-Type'], 'application/json')
+                data = read(response)
+                self.assertEqual(len(data['results']), count)
+                self.assertIsNone(data['next'])
+        post = read(self.client.get(
+            reverse('posts:api_profile', kwargs={'username': 'writer'})
+        ))['results'][0]
+        self.assertEqual(post['text'], 'Пост 4')
+        self.assertEqual(
+            post['author'], {'username': 'writer', 'full_name': 'Лев Толстой'}
+        )
+        self.assertIsNone(post['group'])
+        self.assertIsNone(post['thumbnail'])
+        with self.assertNumQueries(1):
+            read(self.client.get(reverse('posts:api_index')))
+
+    def test_thumbnails_batched(self):
+        """Миниатюры страницы ищутся одним запросом и не ставятся в очередь."""
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            MEDIA_ROOT=root, TASKS_EAGER=False
+        ):
+            posts = [
+                Post.objects.create(
+                    author=self.author,
+                    text=name,
+                    image=SimpleUploadedFile(name, small_gif, 'image/gif'),
+                )
+                for name in ('pending.gif', 'ready.gif')
+            ]
+            thumbnails.generate(posts[1].image.name)
+            jobs = Job.objects.count()
+            with self.assertNumQueries(2):
+                results = read(self.client.get(
+                    reverse('posts:api_index'), {'fields': 'text,thumbnail'}
+                ))['results']
+            self.assertEqual(Job.objects.count(), jobs)
+        found = {post['text']: post['thumbnail'] for post in results}
+        self.assertIsNone(found['pending.gif'])
+        self.assertTrue(found['ready.gif'].startswith('/media/cache/'))
+
+    def test_fields_and_cursor(self):
+        """Выбранные поля и курсор на следующую страницу."""
+        address = reverse('posts:api_profile', kwargs={'username': 'writer'})
+        first = read(self.client.get(
+            address, {'fields': 'id,group', 'limit': 3}
+        ))
+        self.assertEqual(set(first['results'][0]), {'id', 'group'})
+        self.assertEqual(
+            first['results'][1]['group'],
+            {'slug': 'classic', 'title': 'Классика'},
+        )
+        second = read(self.client.get(
+            address, {'fields': 'text', 'limit': 3, 'after': first['next']}
+        ))
+        self.assertEqual(
+            [post['text'] for post in second['results']], ['Пост 1', 'Пост 0']
+        )
+        self.assertIsNone(second['next'])
+
+    def test_gzip(self):
+        """Ответ сжимается, если клиент принимает gzip."""
+        response = self.client.get(
+            reverse('posts:api_index'), HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(read(response)['results'])
+
+    def test_errors(self):
+        """Неверные параметры — 400, неизвестная группа — 404."""
+        address = reverse('posts:api_index')
+        for params in (
+            {'fields': 'text,password'},
+            {'limit': 'many'},
+            {'limit': 1000},
+            {'after': 'broken'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(address, params)
+                self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.get(
+            reverse('posts:api_group_list', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,84 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import follows
+from ..models import Follow, Post, Timeline, UserStats
+
+User = get_user_model()
+
+
+class FollowsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_follow_idempotent(self):
+        """Повторная подписка ничего не меняет."""
+        author = self.authors[0]
+        self.assertEqual(follows.follow(self.reader, [author]), 1)
+        self.assertEqual(follows.follow(self.reader, [author]), 0)
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 1
+        )
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(author).followers_count, 1)
+        self.assertEqual(
+            follows.follow(self.reader, [self.reader]), 0
+        )
+
+    def test_bulk_follow_and_unfollow(self):
+        """Список авторов с уже существующей подпиской."""
+        follows.follow(self.reader, self.authors[:1])
+        self.assertEqual(
+            follows.follow(self.reader, [*self.authors, self.authors[1]]), 2
+        )
+        self.assertEqual(self.stats(self.reader).following_count, 3)
+        for author in self.authors:
+            with self.subTest(author=author):
+                self.assertEqual(self.stats(author).followers_count, 1)
+        self.assertEqual(
+            Timeline.objects.filter(user=self.reader).count(), 3
+        )
+        self.assertEqual(follows.unfollow(self.reader, self.authors[1:]), 2)
+        self.assertEqual(follows.unfollow(self.reader, self.authors[1:]), 0)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.authors[2]).followers_count, 0)
+        self.assertEqual(
+            Timeline.objects.filter(user=self.reader).count(), 1
+        )
+
+    def test_follow_views(self):
+        """Подписка меняет страницу автора, неизвестный автор — 404."""
+        profile = reverse('posts:profile', kwargs={'username': 'author0'})
+        self.client.get(profile)
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author0'})
+        )
+        self.assertContains(self.client.get(profile), 'Подписчиков: 1')
+        for name in ('posts:profile_follow', 'posts:profile_unfollow'):
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse(name, kwargs={'username': 'nobody'})
+                )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author0'})
+        )
+        self.assertContains(self.client.get(profile), 'Подписчиков: 0')
@@ -1,7 +1,11 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -30,3 +34,80 @@ class PostModelTest(TestCase):
         # Проверка модели поста
         post = str(PostModelTest.post)
         self.assertEqual(post, 'Тестовый пост д')
+
+
+class FollowModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+
+    def test_follow_unique_and_not_self(self):
+        """Подписка уникальна и не может быть на самого себя."""
+        Follow.objects.create(user=self.user, author=self.author)
+        for user, author in ((self.user, self.author), (self.user, self.user)):
+            with self.subTest(user=user, author=author):
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        Follow.objects.create(user=user, author=author)
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент не делают полный просмотр таблиц."""
+        call_command('check_feed_plans', stdout=StringIO())
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def assert_counters(self, post):
+        self.author.stats.refresh_from_db()
+        self.user.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(
+            self.author.stats.posts_count, self.author.posts.count()
+        )
+        self.assertEqual(
+            self.author.stats.followers_count, self.author.following.count()
+        )
+        self.assertEqual(
+            self.user.stats.following_count, self.user.follower.count()
+        )
+        self.assertEqual(self.group.posts_count, self.group.post_set.count())
+        self.assertEqual(post.comments_count, post.comments.count())
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются вместе с постами, комментариями, подписками."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assert_counters(post)
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = None
+        post.save()
+        follow.delete()
+        self.assert_counters(post)
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_reconcile_counters(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        UserStats.objects.filter(user=self.author).update(posts_count=10)
+        Group.objects.filter(pk=self.group.pk).update(posts_count=10)
+        Post.objects.filter(pk=post.pk).update(comments_count=10)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assert_counters(post)
@@ -1,12 +1,14 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Group, Post
 
@@ -75,7 +77,9 @@ class PostFormTests(TestCase):
                 author=self.user,
                 text='Тестовый пост созданый',
                 group=self.group.id,
-                image='posts/small.gif'
+                image='posts/small.jpg',
+                image_width=2,
+                image_height=1,
             ).exists()
         )
 
@@ -135,3 +139,40 @@ class PostFormTests(TestCase):
         self.assertRedirects(
             response, f'/auth/login/?next=/posts/{self.post.id}/edit/'
         )
+
+    def upload(self, size, name='photo.jpg', **save_options):
+        file = BytesIO()
+        Image.new('RGB', size, (200, 10, 10)).save(
+            file, 'JPEG', **save_options
+        )
+        return SimpleUploadedFile(name, file.getvalue(), 'image/jpeg')
+
+    def create(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с фото', 'image': image},
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_upload_downscaled_without_metadata(self):
+        """Картинка уменьшается, метаданные удаляются."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        exif[0x0112] = 6
+        self.create(self.upload((400, 200), exif=exif.tobytes()))
+        post = Post.objects.get(text='Пост с фото')
+        # Поворот из EXIF применён до уменьшения.
+        self.assertEqual((post.image_width, post.image_height), (50, 100))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (50, 100))
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(dict(image.getexif()), {})
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_upload_too_large_rejected(self):
+        """Слишком большой файл не сохраняется."""
+        response = self.create(self.upload((50, 50)))
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 100\xa0байт.'
+        )
+        self.assertFalse(Post.objects.filter(text='Пост с фото').exists())
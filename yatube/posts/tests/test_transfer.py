@@ -0,0 +1,124 @@
+import io
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import search, transfer
+from ..models import Comment, Follow, Group, Post, Timeline, UserStats
+
+User = get_user_model()
+
+
+def quiet(message):
+    pass
+
+
+class TransferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Первая книга'
+        )
+        Post.objects.create(author=cls.reader, text='Пост читателя')
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def dump(self, kind, fmt):
+        file = io.StringIO()
+        transfer.export(kind, file, fmt, log=quiet)
+        file.seek(0)
+        return file
+
+    def test_round_trip(self):
+        """Выгруженные данные загружаются обратно со всеми связями."""
+        for fmt in transfer.FORMATS:
+            with self.subTest(fmt=fmt):
+                dumps = {
+                    kind: self.dump(kind, fmt) for kind in transfer.FIELDS
+                }
+                Post.objects.all().delete()
+                Follow.objects.all().delete()
+                for kind in ('posts', 'comments', 'follows'):
+                    transfer.load(kind, dumps[kind], fmt, log=quiet)
+                post = Post.objects.get(pk=self.post.pk)
+                self.assertEqual(post.group, self.group)
+                self.assertEqual(post.pub_date, self.post.pub_date)
+                self.assertEqual(post.comments_count, 1)
+                self.assertEqual(Post.objects.count(), 2)
+                self.assertEqual(
+                    UserStats.objects.get(user=self.author).followers_count, 1
+                )
+                self.assertEqual(
+                    list(Timeline.objects.values_list('user', 'post')),
+                    [(self.reader.pk, self.post.pk)],
+                )
+                self.assertEqual(
+                    search.SearchResults('книги').count(), 1
+                )
+
+    def test_unknown_references_skipped(self):
+        """Строки с неизвестными авторами и группами пропускаются."""
+        rows = io.StringIO(
+            '{"author": "nobody", "text": "a", "pub_date": '
+            '"2020-01-01T00:00:00+00:00"}\n'
+            '{"author": "author", "group": "missing", "text": "b", '
+            '"pub_date": "2020-01-01T00:00:00+00:00"}\n'
+            '{"author": "author", "text": "c", '
+            '"pub_date": "2020-01-01T00:00:00+00:00"}\n'
+        )
+        self.assertEqual(transfer.load('posts', rows, log=quiet), (1, 2))
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 2
+        )
+
+    def test_finish_scope(self):
+        """Без rebuild пересчитываются только затронутые загрузкой строки."""
+        UserStats.objects.filter(user=self.reader).update(posts_count=10)
+        rows = (
+            '{"author": "author", "text": "новый", '
+            '"pub_date": "2020-01-01T00:00:00+00:00"}\n'
+        )
+        transfer.load('posts', io.StringIO(rows), log=quiet)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).posts_count, 10
+        )
+        self.assertEqual(search.SearchResults('новый').count(), 1)
+        self.assertEqual(search.index_missing(Post.objects.all()), 0)
+        self.assertTrue(
+            Timeline.objects.filter(
+                user=self.reader, post__text='новый'
+            ).exists()
+        )
+        transfer.load('posts', io.StringIO(rows), rebuild=True, log=quiet)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).posts_count, 1
+        )
+        self.assertGreater(
+            Post.objects.create(author=self.author, text='после').pk,
+            Post.objects.exclude(text='после').latest('pk').pk,
+        )
+
+    def test_commands(self):
+        """Команды выгрузки и загрузки работают через файл."""
+        stderr, stdout = io.StringIO(), io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'follows.jsonl')
+            call_command('export_data', 'follows', path, stderr=stderr)
+            self.assertIn('follows: 1 строк', stderr.getvalue())
+            Follow.objects.all().delete()
+            call_command(
+                'import_data', 'follows', path, stdout=stdout, stderr=stderr
+            )
+        self.assertIn('Загружено: 1, пропущено: 0', stdout.getvalue())
+        self.assertTrue(Follow.objects.filter(user=self.reader).exists())
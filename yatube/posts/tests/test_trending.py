@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+from core.paginator import decode_cursor, encode_cursor
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import follows, trending
+from ..models import Comment, Post, Trending
+
+User = get_user_model()
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.famous = User.objects.create_user(username='famous')
+        cls.quiet = User.objects.create_user(username='quiet')
+        for number in range(3):
+            follows.follow(
+                User.objects.create_user(username=f'fan{number}'),
+                [cls.famous],
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def ranked(self):
+        return list(
+            trending.feed().order_by('-score', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(post=post, author=self.quiet, text='+')
+
+    def test_comments_raise_rank(self):
+        """Свежие комментарии поднимают пост выше новых постов."""
+        older = Post.objects.create(author=self.quiet, text='Обсуждаемый')
+        newer = Post.objects.create(author=self.quiet, text='Новый')
+        self.assertEqual(self.ranked(), [newer.pk, older.pk])
+        self.comment(older, 2)
+        self.assertEqual(self.ranked(), [older.pk, newer.pk])
+
+    def test_followers_raise_rank(self):
+        """Пост автора с подписчиками выше поста без них."""
+        famous = Post.objects.create(author=self.famous, text='Известный')
+        quiet = Post.objects.create(author=self.quiet, text='Тихий')
+        self.assertEqual(self.ranked(), [famous.pk, quiet.pk])
+
+    def test_half_life(self):
+        """Вклад события вдвое меньше через TRENDING_HALF_LIFE."""
+        now = timezone.now()
+        with self.settings(TRENDING_HALF_LIFE=3600):
+            self.assertAlmostEqual(
+                trending.event(1, now - timedelta(hours=1)),
+                trending.event(0.5, now),
+            )
+
+    def test_incremental_matches_recompute(self):
+        """Рейтинги сигналов совпадают с пересчётом по таблицам."""
+        posts = [
+            Post.objects.create(author=author, text='Пост')
+            for author in (self.famous, self.quiet, self.famous)
+        ]
+        self.comment(posts[1], 3)
+        self.comment(posts[2])
+        incremental = dict(Trending.objects.values_list('post', 'score'))
+        self.assertEqual(trending.recompute(), len(posts))
+        for post_id, score in Trending.objects.values_list('post', 'score'):
+            with self.subTest(post=post_id):
+                self.assertAlmostEqual(score, incremental[post_id], places=6)
+
+    def test_window(self):
+        """Старые посты уходят из ленты, новый комментарий их возвращает."""
+        post = Post.objects.create(author=self.quiet, text='Старый')
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=timezone.now() - timedelta(days=30)
+        )
+        trending.recompute()
+        self.assertNotIn(post.pk, self.ranked())
+        self.comment(post)
+        self.assertIn(post.pk, self.ranked())
+
+    def test_popular_page(self):
+        """Лента популярного листается по курсору из рейтинга."""
+        for number in range(8):
+            post = Post.objects.create(author=self.quiet, text=f'{number}')
+            self.comment(post, number % 3)
+        first = self.client.get(reverse('posts:popular')).context['page_obj']
+        second = self.client.get(
+            reverse('posts:popular'), {'after': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            [post.pk for post in [*first, *second]], self.ranked()
+        )
+        self.assertIsNone(second.next_cursor)
+
+    def test_float_cursor(self):
+        """Курсор хранит числовой ключ без потерь."""
+        self.assertEqual(
+            decode_cursor(encode_cursor(0.1 + 0.2, 7), float),
+            (0.1 + 0.2, 7),
+        )
+        self.assertIsNone(decode_cursor(encode_cursor('x', 7), float))
@@ -53,6 +53,10 @@ class StaticURLTests(TestCase):
                 'user': self.guest_client,
                 'status': HTTPStatus.OK,
             },
+            reverse('posts:popular'): {
+                'user': self.guest_client,
+                'status': HTTPStatus.OK,
+            },
             reverse('posts:group_list', kwargs={'slug': 'test-slug'}): {
                 'user': self.guest_client,
                 'status': HTTPStatus.OK,
@@ -112,6 +116,7 @@ class StaticURLTests(TestCase):
         """URL-адрес использует соответствующий шаблон."""
         url_tempaltes = {
             reverse('posts:index'): 'posts/index.html',
+            reverse('posts:popular'): 'posts/popular.html',
             reverse(
                 'posts:group_list', kwargs={'slug': 'test-slug'}
             ): 'posts/group_list.html',
@@ -2,15 +2,21 @@ import shutil
 import tempfile
 from http import HTTPStatus
 
+from core.cache import bump
+from core.models import Job
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from .. import search, thumbnails
+from ..models import Comment, Follow, Group, Post, Timeline, UserStats
+from ..templatetags.post_cards import card_key
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 TEST_POSTS_QUANTITY = 12
@@ -47,10 +53,11 @@ class PostPagesTests(TestCase):
             group=cls.group,
             image=cls.uploaded
         )
+        thumbnails.generate(cls.post.image.name)
 
     @classmethod
     def tearDownClass(cls):
-        super().setUpClass()
+        super().tearDownClass()
         # Удаляем директорию и всё её содержимое
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
@@ -127,7 +134,9 @@ class PostPagesTests(TestCase):
             'posts:post_detail', kwargs={'post_id': self.post.id}
         ))
         self.assertEqual(response.context['posts'].author, self.user)
-        self.assertEqual(response.context['user_post'].count(), self.post.id)
+        self.assertEqual(
+            response.context['posts'].author.stats.posts_count, self.post.id
+        )
         self.assertEqual(
             response.context['posts'].text, 'Тестовый пост нулевой'
         )
@@ -160,6 +169,153 @@ class PostPagesTests(TestCase):
         first_object = response.context['page_obj'][0]
         self.assertNotEqual(first_object.text, post_update.text)
 
+    def test_cache_pages_invalidated_on_change(self):
+        """Страницы берутся из кэша и сбрасываются при изменениях."""
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+        for address in pages:
+            self.guest_client.get(address)
+            with self.subTest(address=address):
+                with self.assertNumQueries(0):
+                    self.guest_client.get(address)
+        Post.objects.create(
+            author=self.user, text='Совсем новый пост', group=self.group
+        )
+        for address in pages[:3]:
+            with self.subTest(address=address):
+                response = self.guest_client.get(address)
+                self.assertContains(response, 'Совсем новый пост')
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Свежий комментарий'},
+        )
+        response = self.guest_client.get(pages[3])
+        self.assertContains(response, 'Свежий комментарий')
+
+    def test_cache_key_ignores_unknown_params(self):
+        """Посторонние параметры запроса не создают копий страницы."""
+        address = reverse('posts:index')
+        response = self.guest_client.get(address)
+        with self.assertNumQueries(0):
+            other = self.guest_client.get(address, {'utm_source': 'mail'})
+        self.assertEqual(other['ETag'], response['ETag'])
+        self.assertNotEqual(
+            self.guest_client.get(address, {'page': 2})['ETag'],
+            response['ETag'],
+        )
+
+    def test_cache_pages_invalidated_on_rename(self):
+        """Смена имени автора и группы, удаление группы сбрасывают кэш."""
+        author = User.objects.create_user(username='renamed')
+        group = Group.objects.create(title='Старая группа', slug='old-slug')
+        post = Post.objects.create(author=author, text='Пост', group=group)
+        post_page = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        group_page = reverse('posts:group_list', kwargs={'slug': 'old-slug'})
+        for address in (post_page, group_page):
+            self.guest_client.get(address)
+        author.first_name = 'Переименованный'
+        author.save()
+        for address in (post_page, group_page):
+            with self.subTest(address=address):
+                self.assertContains(
+                    self.guest_client.get(address), 'Переименованный'
+                )
+        group.title = 'Новая группа'
+        group.save()
+        self.assertContains(self.guest_client.get(post_page), 'Новая группа')
+        group.delete()
+        self.assertNotContains(
+            self.guest_client.get(post_page), 'Новая группа'
+        )
+        self.assertEqual(
+            self.guest_client.get(group_page).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+
+    def test_conditional_get(self):
+        """Неизменившиеся страницы отвечают 304 без запросов к базе."""
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+        validators = {}
+        for address in pages:
+            page = self.guest_client.get(address)
+            validators[address] = page['ETag']
+            with self.subTest(address=address):
+                self.assertIn('no-cache', page['Cache-Control'])
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(
+                        address, HTTP_IF_NONE_MATCH=page['ETag']
+                    )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertNotIn('Last-Modified', page)
+        Post.objects.create(
+            author=self.user, text='Совсем новый пост', group=self.group
+        )
+        # Правка меняет страницу, но не время последней публикации.
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный пост'
+        post.save()
+        for address in pages:
+            with self.subTest(address=address):
+                response = self.guest_client.get(
+                    address, HTTP_IF_NONE_MATCH=validators[address]
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_thumbnail_placeholder_until_ready(self):
+        """Пока миниатюра создаётся, показывается заглушка.
+
+        Показ страницы миниатюру не создаёт и в очередь не ставит.
+        """
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост с новой картинкой',
+            image=SimpleUploadedFile(
+                name='new.gif',
+                content=self.uploaded.open().read(),
+                content_type='image/gif',
+            ),
+        )
+        address = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        with override_settings(TASKS_EAGER=False):
+            response = self.guest_client.get(address)
+        self.assertContains(response, 'img/gray.jpg')
+        self.assertFalse(Job.objects.exists())
+        thumbnails.generate(post.image.name)
+        response = self.guest_client.get(address)
+        self.assertNotContains(response, 'img/gray.jpg')
+
+    def test_post_cards_cached(self):
+        """Карточки постов берутся из кэша до изменения данных."""
+        pending = Post.objects.create(
+            author=self.user,
+            text='Пост без миниатюры',
+            image=SimpleUploadedFile(
+                name='pending.gif',
+                content=self.uploaded.open().read(),
+                content_type='image/gif',
+            ),
+        )
+        self.guest_client.get(reverse('posts:index'))
+        self.assertIn(self.post.text, cache.get(card_key(self.post)))
+        self.assertIsNone(cache.get(card_key(pending)))
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        self.assertIsNone(cache.get(card_key(self.post)))
+        bump('index')
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новое имя')
+
     def test_list_page_list(self):
         """Проверка paginator."""
         posts = []
@@ -188,6 +344,58 @@ class PostPagesTests(TestCase):
                 response = self.authorized_client.get(reverse_name)
                 self.assertEqual(len(response.context['page_obj']), page)
 
+    def test_list_page_cursor(self):
+        """Проверка курсорной пагинации."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Тестовый пост {number}')
+            for number in range(TEST_POSTS_QUANTITY)
+        )
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        first = self.guest_client.get(reverse('posts:index'))
+        first_page = first.context['page_obj']
+        self.assertEqual(list(first_page), expected[:6])
+        self.assertIsNone(first_page.previous_cursor)
+        second = self.guest_client.get(
+            reverse('posts:index'), {'after': first_page.next_cursor}
+        )
+        second_page = second.context['page_obj']
+        self.assertEqual(list(second_page), expected[6:12])
+        third = self.guest_client.get(
+            reverse('posts:index'), {'after': second_page.next_cursor}
+        )
+        third_page = third.context['page_obj']
+        self.assertEqual(list(third_page), expected[12:])
+        self.assertIsNone(third_page.next_cursor)
+        back = self.guest_client.get(
+            reverse('posts:index'), {'before': third_page.previous_cursor}
+        )
+        self.assertEqual(list(back.context['page_obj']), expected[6:12])
+
+    def test_feed_queries_count(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Тестовый пост {number}',
+                 group=self.group)
+            for number in range(TEST_POSTS_QUANTITY)
+        )
+        Follow.objects.create(user=self.new_user, author=self.user)
+        # Заголовок страницы и лента.
+        pages = {
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}): 2,
+            reverse('posts:profile', kwargs={'username': 'auth'}): 2,
+        }
+        for address, queries in pages.items():
+            with self.subTest(address=address):
+                self.guest_client.get(address)
+                # Сбрасываем кэш страниц, но не кэш миниатюр.
+                bump('group:test-slug', 'profile:auth')
+                with self.assertNumQueries(queries):
+                    self.guest_client.get(address)
+        self.authorized_new_user.get(reverse('posts:follow_index'))
+        # Сессия, пользователь, популярные авторы и сама лента.
+        with self.assertNumQueries(4):
+            self.authorized_new_user.get(reverse('posts:follow_index'))
+
     def test_post_create_page_show_correct_context(self):
         """Проверка созадния поста."""
         group_new = Group.objects.create(
@@ -213,6 +421,7 @@ class PostPagesTests(TestCase):
 
         for reverse_name in pages:
             with self.subTest(reverse_name=reverse_name):
+                cache.clear()
                 response = self.authorized_client.get(reverse_name)
                 first_object = response.context['page_obj'][0]
                 self.assertEqual(first_object.author, self.user)
@@ -251,6 +460,7 @@ class PostPagesTests(TestCase):
             follow=True
         )
         self.assertEqual(new_post.status_code, HTTPStatus.OK)
+        cache.clear()
         response = self.authorized_client.get(
             reverse('posts:post_detail', kwargs={'post_id': self.post.id})
         )
@@ -259,6 +469,37 @@ class PostPagesTests(TestCase):
         self.assertEqual(first_object.author, self.user)
         self.assertEqual(first_object.text, 'Тестовый комментарий')
 
+    def test_comments_paginated(self):
+        """Комментарии выводятся страницами, следующие — фрагментом."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f'Комментарий {n}')
+            for n in range(TEST_POSTS_QUANTITY)
+        )
+        address = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}
+        )
+        # Автор, пост, комментарии и миниатюра.
+        with self.assertNumQueries(4):
+            response = self.guest_client.get(address)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 10)
+        self.assertContains(response, comments.next_cursor)
+        more = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        response = self.guest_client.get(
+            more, {'after': comments.next_cursor}
+        )
+        self.assertEqual(len(response.context['comments']), 2)
+        self.assertNotContains(response, 'data-more-comments')
+        response = self.guest_client.get(
+            more, {'after': comments.next_cursor, 'format': 'json'}
+        )
+        data = response.json()
+        self.assertIsNone(data['next'])
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['Комментарий 10', 'Комментарий 11'],
+        )
+
     def test_follow_user_subscription(self):
         """Проверка подписки на автора."""
         response = self.authorized_new_user.post(
@@ -315,3 +556,147 @@ class PostPagesTests(TestCase):
                 author=self.user
             ).exists()
         )
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Пост до подписки'
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_timeline_follow_push_unfollow(self):
+        """Подписка переносит посты, новый пост раздаётся, отписка чистит."""
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+        self.assertEqual(self.feed(), [self.old_post])
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            Timeline.objects.filter(user=self.reader, post=new_post).exists()
+        )
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author'})
+        )
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(FOLLOW_TIMELINE_FANOUT_LIMIT=1)
+    def test_timeline_fanout_in_chunks(self):
+        """Пост раздаётся подписчикам частями."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        # Автор не популярный, хотя подписчиков больше одной части.
+        UserStats.objects.filter(user=self.author).update(followers_count=1)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(
+            Timeline.objects.filter(post=new_post).count(), 2
+        )
+
+    @override_settings(FOLLOW_TIMELINE_FANOUT_LIMIT=1)
+    def test_timeline_heavy_author_on_read(self):
+        """Пост популярного автора читается лентой без записи."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(Timeline.objects.filter(post=new_post).exists())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.feed(), [new_post, self.old_post])
+        self.assertFalse([
+            query for query in queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ])
+
+    @override_settings(FOLLOW_TIMELINE=False)
+    def test_timeline_disabled(self):
+        """Без материализованной ленты посты читаются через подписки."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertFalse(Timeline.objects.exists())
+        self.assertEqual(self.feed(), [self.old_post])
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.book = Post.objects.create(
+            author=cls.author, text='Читаю интересные книги по вечерам'
+        )
+        cls.books = Post.objects.create(
+            author=cls.author, text='Книга о книгах и о чтении книг'
+        )
+        Post.objects.create(author=cls.author, text='Пост про погоду')
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query, page=1):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, 'page': page}
+        )
+        return list(response.context['page_obj'])
+
+    def test_stem(self):
+        """Формы слова приводятся к одной основе."""
+        self.assertEqual(
+            {search.stem(word) for word in ('книга', 'книги', 'книгами')},
+            {'книг'},
+        )
+        self.assertEqual(search.stem('Django'), 'django')
+
+    def test_search_ranked(self):
+        """Поиск находит формы слова, лучшие совпадения первыми."""
+        self.assertEqual(self.found('книгу'), [self.books, self.book])
+        self.assertEqual(self.found('интересная книга'), [self.book])
+        self.assertEqual(self.found(''), [])
+
+    def test_filter_posts(self):
+        """Фильтр админки находит все совпадения, пустой запрос — ничего."""
+        posts = Post.objects.all()
+        self.assertEqual(
+            set(search.filter_posts(posts, 'книги')), {self.book, self.books}
+        )
+        self.assertFalse(search.filter_posts(posts, '  ').exists())
+        self.assertFalse(search.filter_posts(posts, '!').exists())
+        self.assertFalse(search.search('  ').exists())
+
+    def test_search_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        book = Post.objects.get(pk=self.book.pk)
+        book.text = 'Читаю журналы'
+        book.save()
+        self.assertEqual(self.found('книги'), [self.books])
+        self.assertEqual(self.found('журнал'), [book])
+        Post.objects.filter(pk=self.books.pk).delete()
+        self.assertEqual(self.found('книги'), [])
+        self.assertEqual(search.rebuild(), Post.objects.count())
+        self.assertEqual(self.found('журнал'), [book])
+
+    def test_search_paginated(self):
+        """Ссылки на страницы выдачи сохраняют запрос."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Книга номер {number}')
+            for number in range(TEST_POSTS_QUANTITY)
+        )
+        search.rebuild()
+        self.assertEqual(len(self.found('книга')), 6)
+        self.assertEqual(len(self.found('книга', page=3)), 2)
+        response = self.client.get(reverse('posts:search'), {'q': 'книга'})
+        self.assertContains(
+            response, '?q=%D0%BA%D0%BD%D0%B8%D0%B3%D0%B0&amp;page=2'
+        )
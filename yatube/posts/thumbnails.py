@@ -0,0 +1,97 @@
+"""Фоновая подготовка миниатюр постов.
+
+Миниатюры всех размеров из ``POST_THUMBNAILS`` создаются задачей очереди
+(``core.queue``) после сохранения картинки, а не во время первого показа
+страницы. Одновременно их создаётся не больше ``THUMBNAIL_WORKERS``.
+Пока миниатюры нет, шаблоны показывают заглушку и ничего не ставят в
+очередь: страницы только читают, в том числе с реплики. Картинки без
+миниатюр дозаполняет команда ``generate_thumbnails``.
+"""
+from core.queue import task
+from django.conf import settings
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    """Ищет готовую миниатюру в хранилище sorl, не создавая её."""
+
+    def get_thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры, который создал бы ``get_thumbnail``."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        return default.kvstore.get(
+            self.get_thumbnail_file(file_, geometry_string, **options)
+        )
+
+
+@task(concurrency=lambda: settings.THUMBNAIL_WORKERS, unique=True)
+def generate(name):
+    """Создаёт все миниатюры картинки синхронно."""
+    for geometry, options in settings.POST_THUMBNAILS.items():
+        get_thumbnail(name, geometry, **options)
+
+
+def schedule(name):
+    """Ставит создание миниатюр в очередь задач.
+
+    Вызывается при создании и изменении поста. Задача уникальна: пока
+    картинка ждёт в очереди, повторные вызовы новых задач не создают.
+    """
+    if name:
+        generate.delay(name)
+
+
+def ready(image, geometry):
+    """Готовая миниатюра или None.
+
+    ``image`` — файл поля картинки или имя файла в хранилище.
+    """
+    options = dict(settings.POST_THUMBNAILS[geometry])
+    return ReadyThumbnailBackend().get_ready_thumbnail(
+        image, geometry, **options
+    )
+
+
+def ready_many(names, geometry):
+    """``{имя картинки: миниатюра}`` для уже готовых миниатюр.
+
+    Записи sorl для всех картинок читаются из кэша одним ``get_many``,
+    а промахи — одним запросом к таблице kvstore.
+    """
+    options = dict(settings.POST_THUMBNAILS[geometry])
+    backend = ReadyThumbnailBackend()
+    keys = {
+        add_prefix(
+            backend.get_thumbnail_file(name, geometry, **options).key
+        ): name
+        for name in set(filter(None, names))
+    }
+    values = default.kvstore.cache.get_many(list(keys))
+    missing = [key for key in keys if key not in values]
+    if missing:
+        values.update(
+            KVStore.objects.filter(key__in=missing).values_list('key', 'value')
+        )
+    return {
+        keys[key]: deserialize_image_file(value)
+        for key, value in values.items()
+        if value and value != EMPTY_VALUE
+    }
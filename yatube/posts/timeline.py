@@ -0,0 +1,164 @@
+"""Лента подписок с раздачей при записи (fan-out-on-write).
+
+Новый пост копируется в ``Timeline`` каждого подписчика автора, и лента
+``follow_index`` читается диапазоном по индексу ``(user, -pub_date)``.
+Посты авторов, у которых больше ``FOLLOW_TIMELINE_FANOUT_LIMIT``
+подписчиков, не раздаются при записи, а добавляются к ленте читателя
+запросом при её открытии (fan-out-on-read). Чтение ленты ничего не
+пишет, поэтому её можно отдавать с реплики.
+
+Раздача нового поста и перенос постов при подписке выполняются задачами
+очереди (``core.queue``). Пост раздаётся частями по
+``FOLLOW_TIMELINE_FANOUT_LIMIT`` подписчиков: каждая задача ставит в
+очередь следующую. Отписка убирает посты сразу.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from core.queue import task
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from .models import Follow, Post, Timeline, UserStats
+
+
+def is_enabled():
+    return settings.FOLLOW_TIMELINE
+
+
+def heavy(authors):
+    """Авторы из queryset ``authors`` со слишком большим числом
+    подписчиков для раздачи.
+    """
+    return UserStats.objects.filter(
+        user__in=authors,
+        followers_count__gt=settings.FOLLOW_TIMELINE_FANOUT_LIMIT,
+    ).values_list('user', flat=True)
+
+
+def push(post, after=0):
+    """Добавляет пост в ленты подписчиков с ``id`` больше ``after``.
+
+    Возвращает ``id`` последнего подписчика части или None, если
+    подписчиков больше нет.
+    """
+    user_ids = list(
+        Follow.objects.filter(
+            author=post.author_id, user__gt=after
+        ).order_by('user').values_list('user', flat=True)[
+            :settings.FOLLOW_TIMELINE_FANOUT_LIMIT
+        ]
+    )
+    Timeline.objects.bulk_create(
+        (
+            Timeline(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in user_ids
+        ),
+        ignore_conflicts=True,
+    )
+    if len(user_ids) < settings.FOLLOW_TIMELINE_FANOUT_LIMIT:
+        return None
+    return user_ids[-1]
+
+
+@task
+def push_post(post_id, after=0):
+    """``push`` для очереди: раздаёт часть и ставит в очередь следующую.
+
+    Пост мог быть удалён, пока задача ждала. Посты популярных авторов
+    не раздаются: ``feed`` читает их сам.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        return
+    if not after and heavy([post.author_id]).exists():
+        return
+    last = push(post, after)
+    if last is not None:
+        push_post.delay(post_id, last)
+
+
+@task
+def backfill(user_id, author_ids):
+    """Переносит в ленту пользователя все посты новых авторов.
+
+    Авторы, от которых пользователь успел отписаться, пропускаются.
+    """
+    Timeline.objects.bulk_create(
+        (
+            Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in Post.objects.filter(
+                author__in=Follow.objects.filter(
+                    user=user_id, author__in=author_ids
+                ).values('author')
+            ).values_list('pk', 'pub_date').iterator()
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def fill(follows):
+    """``backfill`` для всех подписок из queryset ``follows``."""
+    pairs = follows.order_by('user').values_list('user', 'author')
+    for user_id, group in groupby(pairs.iterator(), key=itemgetter(0)):
+        backfill(user_id, [author_id for _, author_id in group])
+
+
+def purge(user_id, author_ids):
+    """Убирает из ленты пользователя посты авторов после отписки."""
+    Timeline.objects.filter(
+        user=user_id, post__author__in=author_ids
+    ).delete()
+
+
+def rebuild():
+    """Пересобирает ленты всех пользователей одним INSERT ... SELECT."""
+    quote = connection.ops.quote_name
+
+    def column(model, field):
+        return quote(model._meta.get_field(field).column)
+
+    sql = (
+        'INSERT INTO {timeline} ({t_user}, {t_post}, {t_date}) '
+        'SELECT f.{f_user}, p.{p_id}, p.{p_date} '
+        'FROM {follow} f INNER JOIN {post} p ON p.{p_author} = f.{f_author}'
+    ).format(
+        timeline=quote(Timeline._meta.db_table),
+        t_user=column(Timeline, 'user'),
+        t_post=column(Timeline, 'post'),
+        t_date=column(Timeline, 'pub_date'),
+        follow=quote(Follow._meta.db_table),
+        f_user=column(Follow, 'user'),
+        f_author=column(Follow, 'author'),
+        post=quote(Post._meta.db_table),
+        p_id=column(Post, 'id'),
+        p_date=column(Post, 'pub_date'),
+        p_author=column(Post, 'author'),
+    )
+    with transaction.atomic():
+        Timeline.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+
+
+def feed(user):
+    """Посты ленты подписок, упорядочиваемые по ``feed_date``.
+
+    Посты популярных авторов из подписок объединяются с ``Timeline``.
+    """
+    if not is_enabled():
+        return Post.objects.feed().filter(
+            author__in=Follow.objects.values('author').filter(user=user)
+        ).annotate(feed_date=F('pub_date'))
+    authors = list(
+        heavy(Follow.objects.filter(user=user).values('author'))
+    )
+    if not authors:
+        return Post.objects.feed().filter(
+            timeline__user=user
+        ).annotate(feed_date=F('timeline__pub_date'))
+    return Post.objects.feed().filter(
+        Q(pk__in=Timeline.objects.filter(user=user).values('post'))
+        | Q(author__in=authors)
+    ).annotate(feed_date=F('pub_date'))
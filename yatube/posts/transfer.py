@@ -0,0 +1,297 @@
+"""Потоковые выгрузка и загрузка постов, комментариев и подписок.
+
+Строки читаются и пишутся по одной, поэтому память не зависит от объёма
+данных. Выгрузка идёт через ``iterator()``, загрузка — пачками
+``bulk_create`` в отдельных транзакциях. Авторы и группы в файлах
+указаны по ``username`` и ``slug``; их ``id`` ищутся одним запросом на
+пачку и запоминаются. Сигналы при загрузке не срабатывают, поэтому
+счётчики, ленты подписок, поисковый индекс и рейтинги в конце
+пересчитываются для затронутых авторов, групп и постов, а с ``rebuild``
+— целиком.
+"""
+import csv
+import json
+import time
+
+from core.cache import bump
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import counters, search, timeline, trending
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .utils import manual_pub_date
+
+BATCH_SIZE = 2000
+PROGRESS_EVERY = 10000
+FORMATS = ('jsonl', 'csv')
+
+MODELS = {'posts': Post, 'comments': Comment, 'follows': Follow}
+FIELDS = {
+    'posts': ('id', 'author', 'group', 'text', 'pub_date', 'image'),
+    'comments': ('id', 'post', 'author', 'text', 'created'),
+    'follows': ('user', 'author'),
+}
+
+
+class Progress:
+    """Пишет в журнал число обработанных строк и скорость."""
+
+    def __init__(self, kind, log, every=PROGRESS_EVERY):
+        self.kind = kind
+        self.log = log
+        self.every = every
+        self.count = 0
+        self.started = time.perf_counter()
+
+    def step(self, count=1):
+        before = self.count
+        self.count += count
+        if self.count // self.every != before // self.every:
+            self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.count / elapsed if elapsed else 0
+        self.log(f'{self.kind}: {self.count} строк, {rate:.0f} строк/с')
+
+
+def _rows(kind):
+    if kind == 'posts':
+        queryset = Post.objects.values_list(
+            'pk', 'author__username', 'group__slug', 'text', 'pub_date',
+            'image',
+        )
+    elif kind == 'comments':
+        queryset = Comment.objects.values_list(
+            'pk', 'post', 'author__username', 'text', 'created'
+        )
+    else:
+        queryset = Follow.objects.values_list(
+            'user__username', 'author__username'
+        )
+    for values in queryset.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+        row = dict(zip(FIELDS[kind], values))
+        for field in ('pub_date', 'created'):
+            if field in row:
+                row[field] = row[field].isoformat()
+        yield row
+
+
+def export(kind, file, fmt='jsonl', log=print):
+    """Пишет все объекты вида ``kind`` в открытый текстовый файл."""
+    progress = Progress(kind, log)
+    if fmt == 'csv':
+        writer = csv.DictWriter(file, FIELDS[kind])
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(row):
+            file.write(json.dumps(row, ensure_ascii=False) + '\n')
+    for row in _rows(kind):
+        write(row)
+        progress.step()
+    progress.report()
+    return progress.count
+
+
+def read(file, fmt='jsonl'):
+    if fmt == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Lookup:
+    """Кэш ``значение -> id``, дополняемый одним запросом на пачку."""
+
+    def __init__(self, queryset, field):
+        self.queryset = queryset
+        self.field = field
+        self.ids = {}
+
+    def load(self, values):
+        missing = {value for value in values if value} - self.ids.keys()
+        if missing:
+            self.ids.update(self.queryset.filter(
+                **{f'{self.field}__in': missing}
+            ).values_list(self.field, 'pk'))
+
+    def get(self, value):
+        return self.ids.get(value)
+
+
+class Importer:
+    """Собирает объекты из строк, пропуская строки с неизвестными ссылками.
+
+    ``scopes`` копит области кэша страниц, которые нужно сбросить, а
+    ``user_ids``, ``group_ids`` и ``touched_posts`` — затронутые строки.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.model = MODELS[kind]
+        self.users = Lookup(User.objects, 'username')
+        self.groups = Lookup(Group.objects, 'slug')
+        self.post_ids = set()
+        self.scopes = set()
+        self.user_ids = set()
+        self.group_ids = set()
+        self.touched_posts = set()
+        self.skipped = 0
+
+    def build(self, batch):
+        self.users.load(
+            row[field] for row in batch for field in ('author', 'user')
+            if field in row
+        )
+        if self.kind == 'posts':
+            self.groups.load(row.get('group') for row in batch)
+        if self.kind == 'comments':
+            self.post_ids = set(Post.objects.filter(
+                pk__in={int(row['post']) for row in batch}
+            ).values_list('pk', flat=True))
+        build = getattr(self, f'_{self.kind}')
+        objects = []
+        for row in batch:
+            obj = build(row)
+            if obj is None:
+                self.skipped += 1
+            else:
+                objects.append(obj)
+        return objects
+
+    def _posts(self, row):
+        author_id = self.users.get(row['author'])
+        group_id = self.groups.get(row.get('group'))
+        if author_id is None or (row.get('group') and group_id is None):
+            return None
+        self.scopes.update({'index', f"profile:{row['author']}"})
+        self.user_ids.add(author_id)
+        if row.get('group'):
+            self.scopes.add(f"group:{row['group']}")
+            self.group_ids.add(group_id)
+        return Post(
+            id=row.get('id') or None,
+            author_id=author_id,
+            group_id=group_id,
+            text=row['text'],
+            pub_date=parse_datetime(row['pub_date']),
+            image=row.get('image') or '',
+        )
+
+    def _comments(self, row):
+        author_id = self.users.get(row['author'])
+        post_id = int(row['post'])
+        if author_id is None or post_id not in self.post_ids:
+            return None
+        self.scopes.add(f'post:{post_id}')
+        self.touched_posts.add(post_id)
+        return Comment(
+            id=row.get('id') or None,
+            post_id=post_id,
+            author_id=author_id,
+            text=row['text'],
+            created=parse_datetime(row['created']),
+        )
+
+    def _follows(self, row):
+        user_id = self.users.get(row['user'])
+        author_id = self.users.get(row['author'])
+        if None in (user_id, author_id) or user_id == author_id:
+            return None
+        self.scopes.update({
+            f"profile:{row['user']}", f"profile:{row['author']}"
+        })
+        self.user_ids.update((user_id, author_id))
+        return Follow(user_id=user_id, author_id=author_id)
+
+
+def reset_sequence(model):
+    """Сдвигает счётчик ``id`` за загруженные явно ``id`` (PostgreSQL)."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def load(kind, file, fmt='jsonl', batch_size=BATCH_SIZE, rebuild=False,
+         log=print):
+    """Загружает строки вида ``kind``; возвращает (загружено, пропущено).
+
+    Строки с существующим ``id`` или повторной подпиской пропускаются
+    базой (``ignore_conflicts``) и входят в число загруженных.
+    """
+    importer = Importer(kind)
+    progress = Progress(kind, log)
+    with manual_pub_date(Post, Comment):
+        for batch in _batches(read(file, fmt), batch_size):
+            with transaction.atomic():
+                importer.model.objects.bulk_create(
+                    importer.build(batch), ignore_conflicts=True
+                )
+            progress.step(len(batch))
+    progress.report()
+    reset_sequence(importer.model)
+    if rebuild:
+        finish(kind, importer.scopes, log)
+    else:
+        finish_rows(importer, log)
+    return progress.count - importer.skipped, importer.skipped
+
+
+def finish(kind, scopes, log=print):
+    """Пересчитывает целиком то, что обычно поддерживают сигналы."""
+    log('Счётчики, ленты и поисковый индекс')
+    if kind == 'comments':
+        counters.reconcile_posts()
+    else:
+        counters.reconcile_users()
+        if timeline.is_enabled():
+            timeline.rebuild()
+    if kind == 'posts':
+        counters.reconcile_groups()
+        search.rebuild()
+    trending.recompute()
+    bump(*scopes)
+
+
+def finish_rows(importer, log=print):
+    """``finish`` только для авторов, групп и постов из загрузки."""
+    log('Счётчики, ленты и поисковый индекс загруженных строк')
+    if importer.kind == 'comments':
+        posts = Post.objects.filter(pk__in=importer.touched_posts)
+        counters.reconcile_posts(posts)
+        trending.refresh(posts)
+        bump(*importer.scopes)
+        return
+    users = importer.user_ids
+    counters.reconcile_users(UserStats.objects.filter(user__in=users))
+    posts = Post.objects.filter(author__in=users)
+    if importer.kind == 'posts':
+        counters.reconcile_groups(
+            Group.objects.filter(pk__in=importer.group_ids)
+        )
+        search.index_missing(posts)
+        follows = Follow.objects.filter(author__in=users)
+    else:
+        follows = Follow.objects.filter(user__in=users, author__in=users)
+    if timeline.is_enabled():
+        timeline.fill(follows)
+    # Рейтинг поста зависит от числа подписчиков автора.
+    trending.refresh(posts)
+    bump(*importer.scopes)
@@ -0,0 +1,151 @@
+"""Лента популярного: свежие комментарии и подписчики автора.
+
+Публикация поста с весом ``1 + TRENDING_FOLLOWER_WEIGHT * ln(1 + число
+подписчиков автора)`` и каждый комментарий с весом
+``TRENDING_COMMENT_WEIGHT`` добавляют к рейтингу поста свой вес, который
+вдвое уменьшается каждые ``TRENDING_HALF_LIFE`` секунд. Затухание у всех
+постов одинаковое, поэтому их порядок со временем не меняется, и в
+``Trending.score`` хранится ``ln(Σ вес * e^(t / τ))``. Такой рейтинг не
+нужно пересчитывать по часам: новое событие прибавляется к нему одним
+атомарным ``UPDATE``.
+
+Команда ``recompute_trending`` (по cron) пересчитывает рейтинги по
+таблицам за последние ``TRENDING_WINDOW`` секунд. Так учитываются
+удалённые комментарии и новое число подписчиков, а старые посты
+уходят из таблицы. Лента читается по индексу ``(-score, -post)``
+так же, как хронологическая по ``(-pub_date, -id)``.
+"""
+import math
+from datetime import timedelta
+
+from core.cache import bump
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Exp, Greatest, Ln
+from django.utils import timezone
+
+from .models import Comment, Post, Trending, UserStats
+
+BATCH_SIZE = 500
+# Рейтинг меньше нового события в e^30 раз на сумму не влияет; отсечка
+# не даёт EXP уйти в underflow, которого PostgreSQL не прощает.
+NEGLIGIBLE = 30.0
+
+
+def _tau():
+    return settings.TRENDING_HALF_LIFE / math.log(2)
+
+
+def post_weight(followers):
+    return 1 + settings.TRENDING_FOLLOWER_WEIGHT * math.log1p(followers)
+
+
+def event(weight, when):
+    """Вклад события в рейтинг: ``ln(вес) + t / τ``."""
+    return math.log(weight) + when.timestamp() / _tau()
+
+
+def log_add(a, b):
+    """``ln(e^a + e^b)`` без переполнения."""
+    return max(a, b) + math.log1p(math.exp(-abs(a - b)))
+
+
+def window_start(now=None):
+    return (now or timezone.now()) - timedelta(
+        seconds=settings.TRENDING_WINDOW
+    )
+
+
+def compute(posts, comments, since):
+    """Рейтинги постов с событиями после ``since``: ``{id: рейтинг}``.
+
+    Принимает менеджеры или querysets постов и комментариев, поэтому
+    годится и для миграции с историческими моделями.
+    """
+    recent = comments.filter(created__gte=since).order_by()
+    scores = {
+        pk: event(post_weight(followers or 0), pub_date)
+        for pk, pub_date, followers in posts.filter(
+            Q(pub_date__gte=since) | Q(pk__in=recent.values('post'))
+        ).order_by().values_list(
+            'pk', 'pub_date', 'author__stats__followers_count'
+        ).iterator()
+    }
+    weight = settings.TRENDING_COMMENT_WEIGHT
+    for post_id, created in recent.values_list(
+        'post', 'created'
+    ).iterator():
+        # Пост, опубликованный уже после первого запроса, ждёт пересчёта.
+        if post_id in scores:
+            scores[post_id] = log_add(
+                scores[post_id], event(weight, created)
+            )
+    return scores
+
+
+def _save(scores):
+    Trending.objects.bulk_create(
+        (
+            Trending(post_id=post_id, score=score)
+            for post_id, score in scores.items()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_post(post):
+    """Ставит новый пост в ленту с весом по подписчикам автора."""
+    followers = UserStats.objects.filter(user=post.author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    _save({post.pk: event(post_weight(followers or 0), post.pub_date)})
+    bump('trending')
+
+
+def add_comment(comment):
+    """Прибавляет комментарий к рейтингу поста одним ``UPDATE``."""
+    added = event(settings.TRENDING_COMMENT_WEIGHT, comment.created)
+    value = Value(added, output_field=FloatField())
+    floor = Value(added - NEGLIGIBLE, output_field=FloatField())
+    if not Trending.objects.filter(post=comment.post_id).update(
+        score=value + Ln(1 + Exp(Greatest(F('score'), floor) - value))
+    ):
+        # Старый пост вышел из окна, и комментарий возвращает его.
+        _save(compute(
+            Post.objects.filter(pk=comment.post_id),
+            Comment.objects,
+            window_start(),
+        ))
+    bump('trending')
+
+
+def recompute(now=None):
+    """Пересчитывает рейтинги за окно; возвращает число постов в ленте.
+
+    События между расчётом и записью попадут в рейтинг при следующем
+    пересчёте.
+    """
+    scores = compute(Post.objects, Comment.objects, window_start(now))
+    with transaction.atomic():
+        Trending.objects.all().delete()
+        _save(scores)
+    bump('trending')
+    return len(scores)
+
+
+def refresh(posts, now=None):
+    """Пересчитывает рейтинги постов ``posts`` за окно."""
+    scores = compute(posts, Comment.objects, window_start(now))
+    with transaction.atomic():
+        Trending.objects.filter(post__in=posts).delete()
+        _save(scores)
+    bump('trending')
+
+
+def feed():
+    """Посты ленты популярного, упорядочиваемые по ``score``."""
+    return Post.objects.feed().filter(
+        trending__isnull=False
+    ).annotate(score=F('trending__score'))
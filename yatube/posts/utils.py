@@ -0,0 +1,17 @@
+from contextlib import contextmanager
+
+
+@contextmanager
+def manual_pub_date(*models):
+    """Позволяет задавать даты, которые обычно ставит auto_now_add."""
+    fields = [
+        field for model in models for field in model._meta.fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
@@ -1,29 +1,89 @@
+from core.cache import cache_page_generations
+from core.db_router import use_replica
+from core.paginator import CursorPaginator
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from . import follows, search, thumbnails, timeline, trending
+from .cache_keys import POST_AUTHOR_KEY
 from .forms import CommentForm, PostForm
 from .models import Comment, Follow, Group, Post, User
 
-TIME_CASH = 5
 LIMIT = 6
-ONE_FOLLOW = 1
+COMMENTS_LIMIT = 10
 
 
-@cache_page(TIME_CASH, key_prefix='index_page')
+def paginate(request, queryset, key='pub_date', **kwargs):
+    """Страница ленты по курсору (?after=/?before=) или по ?page=N."""
+    return CursorPaginator(queryset, LIMIT, key=key, **kwargs).get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+
+def comments_page(request, post_id):
+    """Страница комментариев поста по порядку, по курсору ?after=."""
+    return CursorPaginator(
+        Comment.objects.filter(post=post_id).select_related('author').only(
+            'post', 'text', 'created', 'author__username'
+        ),
+        COMMENTS_LIMIT,
+        key='created',
+        ascending=True,
+    ).get_page(after=request.GET.get('after'))
+
+
+def post_author(post_id):
+    """Имя автора поста; автор поста не меняется, кэшируем навсегда."""
+    return cache.get_or_set(
+        POST_AUTHOR_KEY.format(post_id),
+        lambda: Post.objects.filter(pk=post_id).values_list(
+            'author__username', flat=True
+        ).first(),
+        None,
+    )
+
+
+@use_replica
+@cache_page_generations(lambda request: ['index'], key_prefix='index_page')
 def index(request):
     return render(
         request,
         'posts/index.html',
         context={
-            'page_obj': Paginator(Post.objects.all(), LIMIT).get_page(
-                request.GET.get('page')
+            'page_obj': paginate(request, Post.objects.feed()),
+        },
+    )
+
+
+# Рейтинги меняются с каждым комментарием (поколение trending), а
+# правки и удаление постов сбрасывают поколение index.
+@use_replica
+@cache_page_generations(
+    lambda request: ['index', 'trending'], key_prefix='popular_page'
+)
+def popular(request):
+    return render(
+        request,
+        'posts/popular.html',
+        context={
+            'page_obj': paginate(
+                request, trending.feed(), key='score', parse=float
             ),
         },
     )
 
 
+@use_replica
+@cache_page_generations(
+    lambda request, slug: [f'group:{slug}'],
+    key_prefix='group_page',
+)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     return render(
@@ -31,24 +91,25 @@ def group_posts(request, slug):
         'posts/group_list.html',
         context={
             'group': group,
-            'page_obj': Paginator(
-                Post.objects.filter(group=group), LIMIT
-            ).get_page(
-                request.GET.get('page')
+            'page_obj': paginate(
+                request, Post.objects.feed().filter(group=group)
             ),
         },
     )
 
 
+@use_replica
+@cache_page_generations(
+    lambda request, username: [f'profile:{username}'],
+    key_prefix='profile_page',
+)
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     context = {
         'username': user,
-        'page_obj': Paginator(
-            Post.objects.filter(author=user), LIMIT
-        ).get_page(
-            request.GET.get('page')
-        ),
+        'page_obj': paginate(request, Post.objects.feed().filter(author=user)),
     }
     if request.user.is_authenticated:
         context['following'] = Follow.objects.filter(
@@ -57,21 +118,74 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@use_replica
+@cache_page_generations(
+    lambda request, post_id: [
+        f'post:{post_id}', f'profile:{post_author(post_id)}'
+    ],
+    key_prefix='post_page',
+)
 def post_detail(request, post_id):
-    posts = get_object_or_404(Post, pk=post_id)
+    posts = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     return render(
         request,
         'posts/post_detail.html',
         context={
             'posts': posts,
             'form': CommentForm(),
-            'comments': Comment.objects.filter(post=post_id),
-            'user_post': Post.objects.filter(author=posts.author),
+            'comments': comments_page(request, post_id),
+        },
+    )
+
+
+@use_replica
+@cache_page_generations(
+    lambda request, post_id: [f'post:{post_id}'], key_prefix='comments_page'
+)
+def post_comments(request, post_id):
+    """Следующие страницы комментариев: HTML-фрагмент или JSON."""
+    comments = comments_page(request, post_id)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next': comments.next_cursor,
+        })
+    return render(
+        request,
+        'posts/includes/comments.html',
+        context={'comments': comments, 'post_id': post_id},
+    )
+
+
+# Выдача поиска зависит от всех постов, как и главная страница.
+@use_replica
+@cache_page_generations(lambda request: ['index'], key_prefix='search_page')
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    return render(
+        request,
+        'posts/search.html',
+        context={
+            'query': query,
+            'page_obj': Paginator(search.search(query), LIMIT).get_page(
+                request.GET.get('page')
+            ),
         },
     )
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -81,11 +195,13 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post.image.name)
         return redirect('posts:profile', request.user.username)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     posts = get_object_or_404(Post, id=post_id, author=request.user)
     form = PostForm(
@@ -95,6 +211,8 @@ def post_edit(request, post_id):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post.image.name)
         return redirect('posts:post_detail', post_id)
     return render(
         request,
@@ -108,6 +226,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -119,37 +238,31 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@use_replica
 @login_required
 def follow_index(request):
     return render(
         request,
         'posts/follow.html',
         context={
-            'page_obj': Paginator(
-                Post.objects.filter(
-                    author__in=Follow.objects.values(
-                        'author'
-                    ).filter(user=request.user)
-                ),
-                LIMIT,
-            ).get_page(request.GET.get('page'))
+            'page_obj': paginate(
+                request, timeline.feed(request.user), key='feed_date'
+            )
         },
     )
 
 
 @login_required
 def profile_follow(request, username):
-    author = User.objects.get(username=username)
-    count = Follow.objects.filter(user=request.user, author=author).count()
-    if request.user.username == username or count == ONE_FOLLOW:
-        return redirect('posts:profile', username=username)
-    Follow.objects.create(user=request.user, author=author)
+    follows.follow(request.user, [
+        get_object_or_404(User.objects.only('username'), username=username)
+    ])
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    Follow.objects.filter(
-        user=request.user, author=User.objects.get(username=username)
-    ).delete()
+    follows.unfollow(request.user, [
+        get_object_or_404(User.objects.only('username'), username=username)
+    ])
     return redirect('posts:profile', username=username)
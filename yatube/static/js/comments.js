@@ -0,0 +1,23 @@
+// Подгрузка следующих страниц комментариев на странице поста.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('[data-more-comments]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  link.classList.add('disabled');
+  fetch(link.href, {credentials: 'same-origin'})
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.statusText);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      link.parentElement.insertAdjacentHTML('afterend', html);
+      link.parentElement.remove();
+    })
+    .catch(function () {
+      link.classList.remove('disabled');
+    });
+});
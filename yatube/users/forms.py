@@ -1,5 +1,9 @@
+from django.contrib.auth import forms as auth_forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
+from django.template import loader
+
+from . import tasks
 
 User = get_user_model()
 
@@ -8,3 +12,25 @@ class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+
+class PasswordResetForm(auth_forms.PasswordResetForm):
+    """Письмо для сброса пароля уходит в очередь, а не из запроса."""
+
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        subject = ''.join(
+            loader.render_to_string(subject_template_name, context)
+            .splitlines()
+        )
+        html = None
+        if html_email_template_name is not None:
+            html = loader.render_to_string(html_email_template_name, context)
+        tasks.send_mail.delay(
+            subject,
+            loader.render_to_string(email_template_name, context),
+            from_email,
+            [to_email],
+            html,
+        )
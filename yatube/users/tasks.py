@@ -0,0 +1,12 @@
+"""Фоновые задачи пользователей (см. ``core.queue``)."""
+from core.queue import task
+from django.core.mail import EmailMultiAlternatives
+
+
+@task
+def send_mail(subject, body, from_email, to, html=None):
+    """Отправляет письмо через ``EMAIL_BACKEND``; при сбое повторяется."""
+    message = EmailMultiAlternatives(subject, body, from_email, to)
+    if html is not None:
+        message.attach_alternative(html, 'text/html')
+    message.send()
@@ -2,13 +2,22 @@ import os
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+
+def env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+def env_int(name, default):
+    return int(os.getenv(name, default))
+
+
 SECRET_KEY = os.getenv(
     'SECRET_KEY', default='2^w$9%&-*_%+ilyr_tg-6sq=5=@*1vp_(0_3v4&l_6ta+$#!7c'
 )
 
-DEBUG = True
+DEBUG = env_bool('DEBUG', True)
 
-ALLOWED_HOSTS = ['*']
+ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '*').split(',')
 
 INSTALLED_APPS = [
     'posts.apps.PostsConfig',
@@ -26,6 +35,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.InstrumentationMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -41,9 +53,9 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
+        'APP_DIRS': DEBUG,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -56,17 +68,80 @@ TEMPLATES = [
     },
 ]
 
+if not DEBUG:
+    # Шаблоны компилируются один раз и хранятся в памяти процесса.
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# yatube.asgi (uvicorn yatube.asgi:application) выполняет представления в
+# пулах потоков: для чтения и для записи. Пул соединений с базой должен
+# вмещать оба.
+ASGI_READ_THREADS = env_int('ASGI_READ_THREADS', 16)
+ASGI_WRITE_THREADS = env_int('ASGI_WRITE_THREADS', 4)
 
 
 # Database
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# Бэкенды core.db.backends умеют пул соединений (core.db.pool).
+if os.getenv('DB_ENGINE', 'sqlite3') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'core.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'yatube'),
+            'USER': os.getenv('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # В конце запроса соединение возвращается в пул.
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                'pool': {
+                    # На каждый процесс gunicorn.
+                    'size': env_int('DB_POOL_SIZE', 5),
+                    'max_overflow': env_int('DB_POOL_MAX_OVERFLOW', 5),
+                    'timeout': env_int('DB_POOL_TIMEOUT', 10),
+                    'recycle': env_int('DB_POOL_RECYCLE', 60 * 60),
+                    'check_interval': env_int('DB_POOL_CHECK_INTERVAL', 30),
+                },
+            },
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'core.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+            # Открыть SQLite дёшево, пул не нужен, соединение живёт
+            # между запросами.
+            'CONN_MAX_AGE': env_int('DB_CONN_MAX_AGE', 600),
+            'OPTIONS': {
+                'pragmas': {
+                    'journal_mode': 'WAL',
+                    # С WAL потеря питания не портит базу, fsync только
+                    # на контрольных точках.
+                    'synchronous': 'NORMAL',
+                    'mmap_size': env_int('DB_MMAP_SIZE', 256 * 2 ** 20),
+                    'busy_timeout': 5000,
+                },
+            },
+        }
+    }
+
+# Алиасы из DATABASES, с которых читаются страницы ленты (core.db_router).
+# Например, для копии базы рядом с основной:
+# DATABASES['replica'] = {**DATABASES['default'], 'NAME': '/srv/replica.db'}
+# DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Сколько секунд после записи клиент читает с основной базы.
+REPLICA_PIN_SECONDS = 5
+# Страницы, прочитанные с отстающей реплики, кэшируются ненадолго.
+REPLICA_PAGE_CACHE_TIMEOUT = 60
 
 
 # Password validation
@@ -104,10 +179,43 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.getenv(
+    'STATIC_ROOT', os.path.join(BASE_DIR, 'collected_static')
+)
+# collectstatic склеивает бандлы, добавляет хэш в имена и сжимает файлы.
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+# Бандл -> исходные файлы; с DEBUG страницы подключают исходники.
+STATIC_BUNDLES = {
+    'css/yatube.min.css': [
+        'css/bootstrap.min.css',
+        'css/ionicons.min.css',
+        'css/bs-theme-overrides.css',
+        'css/Articles-Cards-images.css',
+        'css/Footer-Clean-icons.css',
+        'css/Gamanet_Pagination_bs5.css',
+        'css/Navbar-Right-Links-icons.css',
+    ],
+}
+# Cache-Control для статики без хэша в имени.
+STATIC_MAX_AGE = 60 * 60
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Миниатюры постов: размер -> параметры sorl-thumbnail
+POST_THUMBNAILS = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+# Миниатюр создаётся одновременно не больше, на всех воркерах задач.
+THUMBNAIL_WORKERS = 2
+
+# Загруженные картинки постов (posts.images)
+POST_IMAGE_MAX_UPLOAD_SIZE = 10 * 2 ** 20
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_SIDE = 2048
+POST_IMAGE_QUALITY = 85
+POST_IMAGE_WEBP = False
+
 
 # Login
 
@@ -129,12 +237,94 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # Caches
 
+# Один файл кэша на все процессы gunicorn: страницы и поколения общие.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 2 ** 20,
+        },
     }
 }
+# Страницы сбрасываются через поколения (core.cache), таймаут лишь
+# вытесняет неиспользуемые копии.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+# Ключ карточки поста содержит отпечаток её данных, устаревшие карточки
+# просто перестают запрашиваться.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Instrumentation
+
+INSTRUMENTATION_SAMPLE_RATE = float(
+    os.getenv('INSTRUMENTATION_SAMPLE_RATE', default='0.01')
+)
+INSTRUMENTATION_DUPLICATE_THRESHOLD = 3
+# Повторы этих запросов ожидаемы: sorl ищет каждую миниатюру отдельно.
+INSTRUMENTATION_DUPLICATE_IGNORE = ('thumbnail_kvstore',)
+# Время отрисовки каждого шаблона и include в метриках запроса.
+TEMPLATE_PROFILING = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # DEBUG добавляет в журнал повторяющиеся SQL-запросы.
+        'yatube.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUESTS_LOG_LEVEL', 'INFO'),
+        },
+        'yatube.tasks': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
 
 # error 403
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Follow timeline
+
+FOLLOW_TIMELINE = True
+# Посты авторов с большим числом подписчиков не раздаются, а читаются
+# лентой при открытии; столько же подписчиков получает пост за одну
+# задачу раздачи.
+FOLLOW_TIMELINE_FANOUT_LIMIT = 1000
+
+# Trending feed
+
+# Вклад поста и комментария в рейтинг вдвое меньше через полсуток.
+TRENDING_HALF_LIFE = 12 * 60 * 60
+# recompute_trending учитывает события за неделю.
+TRENDING_WINDOW = 7 * 24 * 60 * 60
+TRENDING_COMMENT_WEIGHT = 1.0
+TRENDING_FOLLOWER_WEIGHT = 1.0
+
+# Background tasks
+
+# Задачи выполняет отдельный процесс `manage.py run_tasks`; без него
+# ленты подписок и миниатюры не обновляются.
+
+# С TASKS_EAGER задачи выполняются сразу при постановке в очередь
+# (так настроены тесты, см. settings_test.py).
+TASKS_EAGER = env_bool('TASKS_EAGER', False)
+# Исключение задачи в режиме TASKS_EAGER выходит из delay(), иначе
+# только пишется в журнал yatube.tasks.
+TASKS_EAGER_PROPAGATES = False
+# Задача, которая ждёт дольше, показывается в task_stats как stalled:
+# воркер, скорее всего, не запущен.
+TASKS_STALLED_AFTER = 5 * 60
+TASKS_WORKER_THREADS = env_int('TASKS_WORKER_THREADS', 4)
+TASKS_MAX_ATTEMPTS = 5
+# Пауза перед повтором, с; удваивается с каждой попыткой.
+TASKS_RETRY_DELAY = 10
+# Задача, которая выполняется дольше, возвращается в очередь: её воркер
+# считается упавшим. Должно быть больше времени самой долгой задачи.
+TASKS_TIMEOUT = 10 * 60
+TASKS_RETENTION = 24 * 60 * 60
@@ -0,0 +1,31 @@
+"""Настройки для тестов: ``manage.py test`` и pytest.
+
+Кэш тот же SQLiteCache, что и в работе, но в отдельном файле, который
+создаётся на прогон: тестовая база создаётся заново, и страницы из
+прошлого прогона ей не соответствуют.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES
+
+CACHE_DIR = tempfile.mkdtemp(prefix='yatube-test-cache-')
+atexit.register(shutil.rmtree, CACHE_DIR, ignore_errors=True)
+CACHES = {
+    'default': {
+        **CACHES['default'],
+        'LOCATION': os.path.join(CACHE_DIR, 'cache.sqlite3'),
+    }
+}
+
+# Без DEBUG манифест нужен для каждого {% static %}, а тесты не
+# запускают collectstatic; сам манифест проверяет core.tests.
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+# Задачи выполняются сразу при постановке в очередь, без воркера, и
+# упавшая задача роняет тест, который её поставил.
+TASKS_EAGER = True
+TASKS_EAGER_PROPAGATES = True